@@ -0,0 +1,277 @@
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from opening_book import read_records
+
+# Positions searched or waiting to be written per worker, which bounds the memory of the pipeline
+POSITIONS_IN_FLIGHT_PER_WORKER = 4
+
+# Positions written between two checkpoints
+CHECKPOINT_EVERY = 100
+
+CHECKPOINT_VERSION = 1
+
+# State of a worker process, kept warm between positions
+worker_minimax = None
+worker_board = None
+worker_settings: dict = None
+
+
+def initialize_worker(settings: dict):
+    """Runs once in every worker process, building the Minimax every position of the worker is searched with"""
+    global worker_minimax, worker_settings
+    from strategies.minimax import Minimax
+    worker_settings = settings
+    worker_minimax = Minimax(**settings['options'])
+
+
+def get_worker_board(board_size: int, moves: tuple[tuple[int, int], ...]):
+    """Returns the board of the worker at a position, only placing or cancelling the moves that changed
+
+    Consecutive positions of a game share all but their last move, so a worker mostly places one stone.
+    """
+    global worker_board
+    from board import Board
+    if worker_board is None or worker_board.board_size != board_size:
+        worker_board = Board(board_size)
+    board = worker_board
+
+    cells = [y * board_size + x for x, y in moves]
+    common = 0
+    while common < min(len(cells), len(board.moves)) and board.moves[common] == cells[common]:
+        common += 1
+    while len(board.moves) > common:
+        board.cancel()
+    for x, y in moves[common:]:
+        board.place(x, y)
+    return board
+
+
+def analyse_position(index: int, game: int, ply: int, moves: tuple[tuple[int, int], ...], played: tuple[int, int]) -> dict:
+    """Searches one position in a worker, returns its record with the best move, score and principal variation
+
+    Every position is searched from empty tables, so its record does not depend on which positions the
+    worker searched before it, and a resumed run writes the same records as an uninterrupted one. The
+    empty board has no candidates, and its best move is the centre as the bot plays it.
+    """
+    settings = worker_settings
+    board = get_worker_board(settings['board_size'], moves)
+    size = board.board_size
+    start = time.perf_counter()
+    worker_minimax.new_game()
+    score, candidate = worker_minimax.search(board, time_limit=settings['time_limit'], max_depth=settings['depth'])
+    principal_variation = [[cell % size, cell // size] for cell in worker_minimax.principal_variation]
+    if candidate is None and not board.moves:
+        best = [size // 2, size // 2]
+        principal_variation = [best]
+    else:
+        best = None if candidate is None else [candidate.point.x, candidate.point.y]
+    return {
+        'index': index,
+        'game': game,
+        'ply': ply,
+        'player': str(board.current_player).lower(),
+        'played': list(played),
+        'best': best,
+        'score': score,
+        'pv': principal_variation,
+        'depth': worker_minimax.completed_depth,
+        'nodes': worker_minimax.nodes,
+        'seconds': round(time.perf_counter() - start, 6),
+    }
+
+
+def positions(paths: list[str], first_ply: int = 0):
+    """Yields (game, ply, moves before the ply, move played) for every position of every game, reading one game at a time
+
+    Games are numbered across the files in the order they are given.
+    """
+    game = 0
+    for path in paths:
+        for moves, _ in read_records(path):
+            for ply in range(first_ply, len(moves)):
+                yield game, ply, tuple(moves[:ply]), moves[ply]
+            game += 1
+
+
+class Checkpoint:
+    """How far the analysis got: the positions written, in input order, and the size of the output holding them
+
+    It is replaced atomically, and only after the output has been flushed to disk, so after a crash the
+    output can be cut back to the checkpoint and the analysis picked up from the next position.
+    """
+    def __init__(self, path: str, settings: dict):
+        self.path: str = path
+        self.settings: dict = settings
+        self.positions: int = 0
+        self.offset: int = 0
+
+    def load(self) -> bool:
+        """Reads the checkpoint if there is one, refusing one written with other inputs or settings"""
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path) as file:
+            state = json.load(file)
+        if state.get('version') != CHECKPOINT_VERSION or state.get('settings') != self.settings:
+            raise ValueError(f'{self.path} was written by an analysis of other inputs or settings')
+        self.positions, self.offset = state['positions'], state['offset']
+        return True
+
+    def save(self, positions: int, offset: int):
+        self.positions, self.offset = positions, offset
+        temporary = f'{self.path}.tmp'
+        with open(temporary, 'w') as file:
+            json.dump({'version': CHECKPOINT_VERSION, 'settings': self.settings, 'positions': positions, 'offset': offset}, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self.path)
+
+
+class AnalysisPipeline:
+    """Searches every position of archives of games over a pool of worker processes, writing the results as JSON lines
+
+    Games are read lazily and their positions are handed to the workers a few at a time. Results come
+    back in any order, and are held until every earlier position has been written, so the output is in
+    input order. At most a fixed number of positions per worker are searched or held at once, which
+    bounds memory however large the archives are. A checkpoint saved every few positions lets a run
+    killed halfway carry on where it stopped.
+    """
+    def __init__(self, paths: list[str], output_path: str, board_size: int = 15, depth: int = None,
+                 time_limit: float = None, options: dict[str, bool] = None, first_ply: int = 0, workers: int = None,
+                 checkpoint_path: str = None, checkpoint_every: int = CHECKPOINT_EVERY):
+        from strategies.minimax import MAX_SEARCH_DEPTH
+        if depth is None and time_limit is None:
+            raise ValueError('the analysis needs a depth or a time limit')
+        self.paths: list[str] = list(paths)
+        self.output_path: str = output_path
+        self.first_ply: int = first_ply
+        self.workers: int = workers or os.cpu_count() or 1
+        self.checkpoint_every: int = checkpoint_every
+        self.settings: dict = {
+            'inputs': [os.path.abspath(path) for path in self.paths],
+            'board_size': board_size,
+            'depth': depth or MAX_SEARCH_DEPTH,
+            'time_limit': time_limit,
+            'options': dict(sorted((options or {}).items())),
+            'first_ply': first_ply,
+        }
+        self.checkpoint: Checkpoint = Checkpoint(checkpoint_path or f'{output_path}.checkpoint', self.settings)
+        self.written: int = 0
+        self.nodes: int = 0
+        self.elapsed: float = 0.0
+
+    def run(self, resume: bool = True, progress=None) -> dict:
+        """Analyses every position not written yet, returns a summary of the run"""
+        resumed = resume and self.checkpoint.load()
+        if resumed:
+            if not os.path.exists(self.output_path):
+                raise ValueError(f'{self.output_path} is missing, start over without the checkpoint')
+            output = open(self.output_path, 'r+b')
+            output.truncate(self.checkpoint.offset)
+            output.seek(self.checkpoint.offset)
+        else:
+            output = open(self.output_path, 'wb')
+            self.checkpoint.save(0, 0)
+        skipped = self.checkpoint.positions
+
+        start = time.perf_counter()
+        next_index = skipped
+        tasks = positions(self.paths, self.first_ply)
+        for _ in range(skipped):
+            if next(tasks, None) is None:
+                break
+
+        pending = set()
+        finished: dict[int, dict] = {}
+        window = self.workers * POSITIONS_IN_FLIGHT_PER_WORKER
+        submitted = skipped
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=initialize_worker,
+                                     initargs=(self.settings,)) as executor:
+                while True:
+                    while submitted - next_index < window:
+                        task = next(tasks, None)
+                        if task is None:
+                            break
+                        pending.add(executor.submit(analyse_position, submitted, *task))
+                        submitted += 1
+                    if not pending:
+                        break
+
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        record = future.result()
+                        finished[record['index']] = record
+                    while next_index in finished:
+                        record = finished.pop(next_index)
+                        output.write((json.dumps(record) + '\n').encode())
+                        self.nodes += record['nodes']
+                        self.written += 1
+                        next_index += 1
+                        if next_index % self.checkpoint_every == 0:
+                            self.save_checkpoint(output, next_index)
+                    if progress is not None:
+                        progress(next_index)
+            self.save_checkpoint(output, next_index)
+        finally:
+            output.close()
+
+        self.elapsed = time.perf_counter() - start
+        return {
+            'positions': next_index,
+            'resumed_from': skipped if resumed else None,
+            'analysed': self.written,
+            'nodes': self.nodes,
+            'seconds': self.elapsed,
+            'positions_per_second': self.written / self.elapsed if self.elapsed else 0.0,
+            'workers': self.workers,
+        }
+
+    def save_checkpoint(self, output, positions: int):
+        output.flush()
+        os.fsync(output.fileno())
+        self.checkpoint.save(positions, output.tell())
+
+
+def main(argv: list[str] = None) -> int:
+    from bench import SEARCH_OPTIONS
+    parser = argparse.ArgumentParser(description='Searches every position of files of games, writing the results as JSON lines')
+    parser.add_argument('records', nargs='+', help='files of games, one per line as JSON or as x,y moves')
+    parser.add_argument('--output', required=True, help='file the analysis is written to')
+    parser.add_argument('--size', type=int, default=15, help='board size of the games')
+    parser.add_argument('--depth', type=int, help='deepest iteration of every search')
+    parser.add_argument('--time-limit', type=float, help='seconds per position')
+    parser.add_argument('--first-ply', type=int, default=0, help='first ply of every game analysed')
+    parser.add_argument('--workers', type=int, help='search processes, the number of cores by default')
+    parser.add_argument('--enable', nargs='+', default=[], choices=SEARCH_OPTIONS, help='search options to switch on')
+    parser.add_argument('--disable', nargs='+', default=[], choices=SEARCH_OPTIONS, help='search options to switch off')
+    parser.add_argument('--checkpoint', help='checkpoint file, the output with .checkpoint by default')
+    parser.add_argument('--checkpoint-every', type=int, default=CHECKPOINT_EVERY, help='positions written between checkpoints')
+    parser.add_argument('--restart', action='store_true', help='start over instead of resuming from the checkpoint')
+    args = parser.parse_args(argv)
+    if args.depth is None and args.time_limit is None:
+        parser.error('give --depth, --time-limit or both')
+
+    options = {option: True for option in args.enable}
+    options.update({option: False for option in args.disable})
+    pipeline = AnalysisPipeline(args.records, args.output, args.size, args.depth, args.time_limit, options,
+                                args.first_ply, args.workers, args.checkpoint, args.checkpoint_every)
+
+    def progress(positions: int):
+        print(f'\r{positions} positions', end='', file=sys.stderr, flush=True)
+
+    try:
+        summary = pipeline.run(resume=not args.restart, progress=progress)
+    except ValueError as error:
+        print(error, file=sys.stderr)
+        return 1
+    print(file=sys.stderr)
+    print(json.dumps(summary), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
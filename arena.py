@@ -0,0 +1,394 @@
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from stones import Stone
+
+STRATEGIES = ('bot', 'minimax', 'random')
+
+# Seconds a search side spends per move when neither a time nor a depth is given
+ARENA_TIME_LIMIT = 0.1
+
+# Moves played at random after the centre to open every pair of games differently
+RANDOM_PLIES = 2
+
+# Games handed to every worker ahead of the one it is playing, so the pool never waits on the parent
+GAMES_IN_FLIGHT_PER_WORKER = 2
+
+# Two sided normal quantile of the confidence intervals
+CONFIDENCE_Z = 1.96
+
+# Players of a worker process, built on their first game and kept warm between games
+worker_players: dict = {}
+
+
+class PlayerConfig:
+    """How one side of the arena plays: its strategy, depth, time per move and search options
+
+    The bot strategy plays like the game, with the opening book and threat search before minimax. The
+    minimax strategy only deepens Minimax.search, and the random strategy plays any point next to the
+    stones. Without a time limit a search side searches to its depth, and without either it gets
+    ARENA_TIME_LIMIT seconds a move.
+    """
+    def __init__(self, name: str, strategy: str = 'bot', depth: int = None, time_limit: float = None,
+                 options: dict[str, bool] = None, book: str = None):
+        if strategy not in STRATEGIES:
+            raise ValueError(f'unknown strategy {strategy!r}, expected one of {", ".join(STRATEGIES)}')
+        if depth is None and time_limit is None:
+            time_limit = ARENA_TIME_LIMIT
+        self.name: str = name
+        self.strategy: str = strategy
+        self.depth: int = depth
+        self.time_limit: float = time_limit
+        self.options: dict[str, bool] = dict(options or {})
+        self.book: str = book
+
+    def key(self) -> tuple:
+        return (self.name, self.strategy, self.depth, self.time_limit, tuple(sorted(self.options.items())), self.book)
+
+    def describe(self) -> dict:
+        return {'name': self.name, 'strategy': self.strategy, 'depth': self.depth, 'time_limit': self.time_limit,
+                'options': self.options, 'book': self.book}
+
+
+def parse_player(name: str, text: str) -> PlayerConfig:
+    """Reads a side from comma separated settings such as strategy=minimax,depth=3,time=0.5,disable=quiescence
+
+    enable and disable take option names of Minimax joined by +, and name replaces the default name.
+    """
+    from bench import SEARCH_OPTIONS
+    settings = {}
+    options = {}
+    for item in filter(None, text.split(',')):
+        key, _, value = item.partition('=')
+        key = key.strip()
+        if key in ('enable', 'disable'):
+            for option in filter(None, value.split('+')):
+                if option not in SEARCH_OPTIONS:
+                    raise ValueError(f'unknown search option {option!r}')
+                options[option] = key == 'enable'
+        elif key in ('name', 'strategy', 'book'):
+            settings[key] = value
+        elif key == 'depth':
+            settings['depth'] = int(value)
+        elif key == 'time':
+            settings['time_limit'] = None if value == 'none' else float(value)
+        else:
+            raise ValueError(f'unknown player setting {key!r}')
+    return PlayerConfig(settings.pop('name', name), options=options, **settings)
+
+
+class Player:
+    """A side built from its configuration inside a worker, choosing moves and reporting what each one cost"""
+    def __init__(self, config: PlayerConfig, seed: int):
+        from bot import Bot
+        from opening_book import OpeningBook
+        from strategies.minimax import Minimax, MAX_SEARCH_DEPTH
+        self.config: PlayerConfig = config
+        self.rng: random.Random = random.Random(seed)
+        self.bot: Bot = None
+        self.minimax: Minimax = None
+        if config.strategy == 'bot':
+            self.bot = Bot(time_limit=config.time_limit, book=OpeningBook(config.book) if config.book else None)
+            self.bot.minimax = Minimax(**config.options)
+            self.bot.max_depth = config.depth or MAX_SEARCH_DEPTH
+            self.minimax = self.bot.minimax
+        elif config.strategy == 'minimax':
+            self.minimax = Minimax(**config.options)
+        self.max_depth: int = config.depth or MAX_SEARCH_DEPTH
+
+    def new_game(self):
+        if self.bot is not None:
+            self.bot.new_game()
+        elif self.minimax is not None:
+            self.minimax.new_game()
+
+    def choose(self, board) -> tuple[tuple[int, int], int, int, int]:
+        """Returns the move for the player to move, its score, the nodes searched and the depth completed"""
+        if self.minimax is not None:
+            self.minimax.nodes = 0
+            self.minimax.completed_depth = 0
+        if self.bot is not None:
+            score, candidate = self.bot.choose_move(board)
+        elif self.minimax is not None:
+            score, candidate = self.minimax.search(board, time_limit=self.config.time_limit, max_depth=self.max_depth)
+        else:
+            return random_move(board, self.rng), board.evaluate_board(), 0, 0
+        if candidate is None:
+            return random_move(board, self.rng), score, self.minimax.nodes, self.minimax.completed_depth
+        return (candidate.point.x, candidate.point.y), score, self.minimax.nodes, self.minimax.completed_depth
+
+
+def random_move(board, rng: random.Random) -> tuple[int, int]:
+    """Returns a random empty point next to the stones, the centre on an empty board, or None on a full board"""
+    size = board.board_size
+    if not board.moves:
+        return size // 2, size // 2
+    manager = board.candidates_manager
+    cells = sorted(set(manager.cells_white) | set(manager.cells_black))
+    if not cells:
+        cells = [y * size + x for y in range(size) for x in range(size) if board.board[y][x] == Stone.EMPTY]
+    if not cells:
+        return None
+    y, x = divmod(rng.choice(cells), size)
+    return x, y
+
+
+def random_opening(board_size: int, plies: int, rng: random.Random) -> list[tuple[int, int]]:
+    """Returns the centre followed by plies random moves, each next to a stone already played"""
+    size = board_size
+    moves = [(size // 2, size // 2)]
+    taken = set(moves)
+    while len(moves) <= plies:
+        near = sorted({(x + dx, y + dy) for x, y in moves for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+                       if 0 <= x + dx < size and 0 <= y + dy < size} - taken)
+        move = rng.choice(near)
+        moves.append(move)
+        taken.add(move)
+    return moves
+
+
+def get_worker_player(config: PlayerConfig, colour: Stone, seed: int) -> Player:
+    """Returns the player of a worker for a configuration and colour, so both sides of a mirror match keep their own tables"""
+    key = (config.key(), colour)
+    player = worker_players.get(key)
+    if player is None:
+        player = Player(config, seed)
+        worker_players[key] = player
+    return player
+
+
+def play_game(index: int, white: PlayerConfig, black: PlayerConfig, opening: list[tuple[int, int]],
+              board_size: int, max_moves: int, seed: int) -> dict:
+    """Plays one game in a worker from an opening, returns its record with the score, nodes and time of every move played"""
+    from board import Board
+    board = Board(board_size)
+    players = {Stone.WHITE: get_worker_player(white, Stone.WHITE, seed), Stone.BLACK: get_worker_player(black, Stone.BLACK, seed)}
+    for player in players.values():
+        player.new_game()
+
+    winner = None
+    for x, y in opening:
+        board.place(x, y)
+        if board.check_win(x, y, board.last_player()):
+            winner = board.last_player()
+
+    scores, nodes, times, depths = [], [], [], []
+    start = time.perf_counter()
+    while winner is None and len(board.moves) < max_moves:
+        move_start = time.perf_counter()
+        move, score, move_nodes, depth = players[board.current_player].choose(board)
+        elapsed = time.perf_counter() - move_start
+        if move is None:
+            break
+        board.place(*move)
+        scores.append(score)
+        nodes.append(move_nodes)
+        times.append(round(elapsed, 6))
+        depths.append(depth)
+        if board.check_win(move[0], move[1], board.last_player()):
+            winner = board.last_player()
+
+    size = board.board_size
+    return {
+        'game': index,
+        'white': white.name,
+        'black': black.name,
+        'winner': None if winner is None else str(winner).lower(),
+        'opening': len(opening),
+        'moves': [[cell % size, cell // size] for cell in board.moves],
+        'scores': scores,
+        'nodes': nodes,
+        'times': times,
+        'depths': depths,
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def elo_difference(score: float) -> float:
+    """Returns the Elo difference expected to give a score, unbounded for a score of 0 or 1"""
+    if score <= 0:
+        return -math.inf
+    if score >= 1:
+        return math.inf
+    return 400 * math.log10(score / (1 - score))
+
+
+def elo_interval(wins: int, draws: int, losses: int, z: float = CONFIDENCE_Z) -> tuple[float, float, float]:
+    """Returns the Elo difference of a result and the bounds of its confidence interval
+
+    The interval is the Wilson score interval of the mean score per game, counting a draw as half a win.
+    Unlike the normal approximation it keeps a width after a few games which all went one way, and its
+    side past a score of 0 or 1 is unbounded.
+    """
+    games = wins + draws + losses
+    if not games:
+        return 0.0, -math.inf, math.inf
+    score = (wins + draws / 2) / games
+    spread = z * z / games
+    centre = (score + spread / 2) / (1 + spread)
+    margin = z * math.sqrt(score * (1 - score) / games + spread / (4 * games)) / (1 + spread)
+    low = -math.inf if score == 0 else elo_difference(centre - margin)
+    high = math.inf if score == 1 else elo_difference(centre + margin)
+    return elo_difference(score), low, high
+
+
+class Arena:
+    """Plays two configurations against each other over a pool of worker processes
+
+    Games are played in pairs from the same random opening with the colours swapped, which cancels most of
+    the advantage of the opening and of moving first. Records are written as JSON lines as soon as each
+    game finishes, in the order they finish, and at most a few games per worker are queued at once so the
+    parent holds little besides the tallies.
+    """
+    def __init__(self, player_a: PlayerConfig, player_b: PlayerConfig, games: int, workers: int = None,
+                 board_size: int = 15, random_plies: int = RANDOM_PLIES, max_moves: int = None, seed: int = 0):
+        if player_a.name == player_b.name:
+            player_b.name = f'{player_b.name}_b'
+        self.player_a: PlayerConfig = player_a
+        self.player_b: PlayerConfig = player_b
+        self.games: int = games
+        self.workers: int = workers or os.cpu_count() or 1
+        self.board_size: int = board_size
+        self.random_plies: int = random_plies
+        self.max_moves: int = max_moves or board_size * board_size
+        self.seed: int = seed
+
+        self.wins: int = 0
+        self.draws: int = 0
+        self.losses: int = 0
+        self.white_wins: int = 0
+        self.black_wins: int = 0
+        self.moves: int = 0
+        self.nodes: int = 0
+        self.elapsed: float = 0.0
+
+    def tasks(self):
+        """Yields the arguments of play_game for every game, an opening at a time for both colours"""
+        rng = random.Random(self.seed)
+        for index in range(self.games):
+            if index % 2 == 0:
+                opening = random_opening(self.board_size, self.random_plies, rng)
+            white, black = (self.player_a, self.player_b) if index % 2 == 0 else (self.player_b, self.player_a)
+            yield index, white, black, opening, self.board_size, self.max_moves, self.seed + index
+
+    def count(self, record: dict):
+        """Adds a finished game to the tallies, from the side of player a"""
+        winner = record['winner']
+        if winner is None:
+            self.draws += 1
+        elif record[winner] == self.player_a.name:
+            self.wins += 1
+        else:
+            self.losses += 1
+        self.white_wins += winner == 'white'
+        self.black_wins += winner == 'black'
+        self.moves += len(record['scores'])
+        self.nodes += sum(record['nodes'])
+
+    def run(self, output=None, progress=None) -> dict:
+        """Plays every game, writing each record to output as one JSON line, and returns the summary"""
+        start = time.perf_counter()
+        tasks = self.tasks()
+        pending = set()
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            while True:
+                while len(pending) < self.workers * GAMES_IN_FLIGHT_PER_WORKER:
+                    arguments = next(tasks, None)
+                    if arguments is None:
+                        break
+                    pending.add(executor.submit(play_game, *arguments))
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    record = future.result()
+                    self.count(record)
+                    if output is not None:
+                        output.write(json.dumps(record) + '\n')
+                        output.flush()
+                    if progress is not None:
+                        progress(self)
+        self.elapsed = time.perf_counter() - start
+        return self.summary()
+
+    def summary(self) -> dict:
+        games = self.wins + self.draws + self.losses
+        elo, low, high = elo_interval(self.wins, self.draws, self.losses)
+        return {
+            'player_a': self.player_a.describe(),
+            'player_b': self.player_b.describe(),
+            'games': games,
+            'wins': self.wins,
+            'draws': self.draws,
+            'losses': self.losses,
+            'score': (self.wins + self.draws / 2) / games if games else 0.0,
+            'elo': elo,
+            'elo_low': low,
+            'elo_high': high,
+            'white_wins': self.white_wins,
+            'black_wins': self.black_wins,
+            'seconds': self.elapsed,
+            'games_per_second': games / self.elapsed if self.elapsed else 0.0,
+            'moves_per_second': self.moves / self.elapsed if self.elapsed else 0.0,
+            'nodes_per_second': self.nodes / self.elapsed if self.elapsed else 0.0,
+            'workers': self.workers,
+        }
+
+
+def format_summary(summary: dict) -> str:
+    a, b = summary['player_a']['name'], summary['player_b']['name']
+    return '\n'.join([
+        f'{a} vs {b}: +{summary["wins"]} ={summary["draws"]} -{summary["losses"]} in {summary["games"]} games '
+        f'(score {summary["score"]:.3f})',
+        f'Elo {summary["elo"]:+.1f} [{summary["elo_low"]:+.1f}, {summary["elo_high"]:+.1f}] at 95%',
+        f'white won {summary["white_wins"]}, black won {summary["black_wins"]}',
+        f'{summary["games_per_second"]:.2f} games/s, {summary["moves_per_second"]:.1f} moves/s, '
+        f'{summary["nodes_per_second"]:.0f} nodes/s on {summary["workers"]} workers in {summary["seconds"]:.1f}s',
+    ])
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Plays two configurations of the engine against each other in bulk')
+    parser.add_argument('--a', default='', help='settings of player a, such as strategy=minimax,depth=3,disable=quiescence')
+    parser.add_argument('--b', default='', help='settings of player b')
+    parser.add_argument('--games', type=int, default=100, help='games to play, in pairs from the same opening')
+    parser.add_argument('--workers', type=int, help='game processes, the number of cores by default')
+    parser.add_argument('--size', type=int, default=15, help='board size')
+    parser.add_argument('--random-plies', type=int, default=RANDOM_PLIES, help='random moves after the centre in every opening')
+    parser.add_argument('--max-moves', type=int, help='moves after which a game is drawn, the whole board by default')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the openings')
+    parser.add_argument('--output', help='file the game records are written to as JSON lines, - for standard output')
+    parser.add_argument('--summary', help='file the summary is written to as JSON')
+    args = parser.parse_args(argv)
+
+    arena = Arena(parse_player('a', args.a), parse_player('b', args.b), args.games, args.workers, args.size,
+                  args.random_plies, args.max_moves, args.seed)
+
+    def progress(current: Arena):
+        played = current.wins + current.draws + current.losses
+        print(f'\r{played}/{current.games} +{current.wins} ={current.draws} -{current.losses}', end='', file=sys.stderr, flush=True)
+
+    if args.output == '-':
+        summary = arena.run(sys.stdout, progress)
+    elif args.output:
+        with open(args.output, 'w') as output:
+            summary = arena.run(output, progress)
+    else:
+        summary = arena.run(None, progress)
+    print(file=sys.stderr)
+    print(format_summary(summary), file=sys.stderr)
+    if args.summary:
+        # JSON has no infinity, so an unbounded Elo or side of its interval is written as null
+        summary = {key: None if isinstance(value, float) and math.isinf(value) else value for key, value in summary.items()}
+        with open(args.summary, 'w') as file:
+            json.dump(summary, file, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
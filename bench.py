@@ -0,0 +1,181 @@
+import argparse
+import json
+import platform
+import sys
+import time
+from board import Board
+from strategies.minimax import Minimax
+
+# Fixed positions every engine change is measured on, as moves alternating white and black from an empty 19x19 board
+CORPUS = {
+    'opening': [(9, 9), (10, 10), (10, 8), (8, 10)],
+    'midgame': [(9, 10), (8, 10), (12, 10), (14, 6), (9, 7), (7, 8), (10, 10), (11, 16), (12, 4), (10, 7), (7, 13), (8, 3),
+                (10, 8), (5, 6), (7, 9), (8, 9), (15, 6), (6, 8), (12, 7), (14, 5), (6, 9), (6, 7), (10, 11), (9, 8)],
+    'tactical': [(9, 9), (9, 10), (10, 9), (10, 10), (11, 9), (12, 12), (8, 8), (11, 10)],
+}
+
+BOARD_SIZE = 19
+
+# Options of Minimax which can be switched on or off from the command line to measure them
+SEARCH_OPTIONS = ('principal_variation_search', 'quiescence', 'late_move_reductions', 'futility_pruning', 'threat_extensions',
+                  'threat_candidates')
+
+# Metrics where a larger value is better, every other metric is a time where smaller is better
+HIGHER_IS_BETTER = ('ops_per_sec', 'evals_per_sec', 'lines_per_sec', 'nodes_per_sec')
+
+
+def setup_position(moves: list[tuple[int, int]], board_size: int = BOARD_SIZE) -> Board:
+    """Returns a new board with the moves played on it"""
+    board = Board(board_size)
+    for x, y in moves:
+        board.place(x, y)
+    return board
+
+
+def replies_for(board: Board, num_of_replies: int = 20) -> list[tuple[int, int]]:
+    """Returns a fixed set of empty points near the stones of a position to play and take back"""
+    size = board.board_size
+    cells = sorted(set(board.candidates_manager.cells_white) | set(board.candidates_manager.cells_black))
+    return [(cell % size, cell // size) for cell in cells[:num_of_replies]]
+
+
+def bench_place_cancel(moves: list[tuple[int, int]], seconds: float = 1.0) -> float:
+    """Returns the number of place, check_win and cancel rounds per second played over a position"""
+    board = setup_position(moves)
+    replies = replies_for(board)
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for x, y in replies:
+            board.place(x, y)
+            board.check_win(x, y, board.last_player())
+            board.cancel()
+        count += len(replies)
+    return count / (time.perf_counter() - start)
+
+
+def bench_evaluate_board(moves: list[tuple[int, int]], seconds: float = 1.0) -> float:
+    """Returns the number of evaluate_board calls per second on a position"""
+    board = setup_position(moves)
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for _ in range(1000):
+            board.evaluate_board()
+        count += 1000
+    return count / (time.perf_counter() - start)
+
+
+def bench_score_line(moves: list[tuple[int, int]], seconds: float = 1.0) -> float:
+    """Returns the number of lines per second scored from scratch with score_line on a position"""
+    board = setup_position(moves)
+    lines = [[board.board[y][x] for x, y in line] for line in board.lines]
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for line in lines:
+            board.score_line(line, board.current_player)
+        count += len(lines)
+    return count / (time.perf_counter() - start)
+
+
+def bench_search(moves: list[tuple[int, int]], max_depth: int, repeats: int = 3,
+                 options: dict[str, bool] = None) -> dict[str, float]:
+    """Runs Minimax.run at every depth up to max_depth, returns the nodes per second and the time taken to reach each depth
+
+    The deepening is repeated with a fresh Minimax, built with the options given, every time and the fastest repeat is kept.
+    """
+    board = setup_position(moves)
+    results = {}
+    for _ in range(repeats):
+        minimax = Minimax(**(options or {}))
+        elapsed = 0.0
+        for depth in range(1, max_depth + 1):
+            start = time.perf_counter()
+            minimax.run(depth, board)
+            elapsed += time.perf_counter() - start
+            metric = f'time_to_depth_{depth}'
+            results[metric] = min(elapsed, results.get(metric, elapsed))
+    results['nodes'] = minimax.nodes
+    results['nodes_per_sec'] = minimax.nodes / results[f'time_to_depth_{max_depth}']
+    return results
+
+
+def run_suite(seconds: float = 1.0, max_depth: int = 3, positions: list[str] = None, repeats: int = 3,
+              options: dict[str, bool] = None) -> dict:
+    """Runs every benchmark over the corpus, returns the results keyed by position and metric"""
+    results = {}
+    for name in positions or CORPUS:
+        moves = CORPUS[name]
+        position = {}
+        position['place_cancel_ops_per_sec'] = bench_place_cancel(moves, seconds)
+        position['evaluate_board_evals_per_sec'] = bench_evaluate_board(moves, seconds)
+        position['score_line_lines_per_sec'] = bench_score_line(moves, seconds)
+        position.update(bench_search(moves, max_depth, repeats, options))
+        results[name] = position
+
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'seconds': seconds,
+        'max_depth': max_depth,
+        'repeats': repeats,
+        'options': options or {},
+        'results': results,
+    }
+
+
+def compare(baseline: dict, current: dict, tolerance: float = 0.1) -> list[str]:
+    """Returns a line for every metric of the current run worse than the baseline by more than the tolerance"""
+    regressions = []
+    for name, metrics in current['results'].items():
+        for metric, value in metrics.items():
+            old_value = baseline['results'].get(name, {}).get(metric)
+            if not old_value or metric == 'nodes':
+                continue
+            if metric.endswith(HIGHER_IS_BETTER):
+                change = (old_value - value) / old_value
+            else:
+                change = (value - old_value) / old_value
+            if change > tolerance:
+                regressions.append(f'{name}.{metric}: {old_value:.6g} -> {value:.6g} ({change:+.1%} worse)')
+    return regressions
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmarks the engine on a fixed corpus of positions')
+    parser.add_argument('--seconds', type=float, default=1.0, help='time spent on every throughput benchmark')
+    parser.add_argument('--depth', type=int, default=3, help='deepest search measured for time-to-depth')
+    parser.add_argument('--repeats', type=int, default=3, help='searches run per position, the fastest is kept')
+    parser.add_argument('--positions', nargs='+', choices=list(CORPUS), help='positions of the corpus to run')
+    parser.add_argument('--enable', nargs='+', default=[], choices=SEARCH_OPTIONS, help='search options to switch on')
+    parser.add_argument('--disable', nargs='+', default=[], choices=SEARCH_OPTIONS, help='search options to switch off')
+    parser.add_argument('--output', help='file to write the results to as JSON')
+    parser.add_argument('--compare', metavar='BASELINE', help='JSON results of an earlier run to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='relative slowdown reported as a regression')
+    args = parser.parse_args(argv)
+
+    options = {option: True for option in args.enable}
+    options.update({option: False for option in args.disable})
+    report = run_suite(args.seconds, args.depth, args.positions, args.repeats, options)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text + '\n')
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        regressions = compare(baseline, report, args.tolerance)
+        for line in regressions:
+            print(f'REGRESSION {line}', file=sys.stderr)
+        if regressions:
+            return 1
+        print('No regressions', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
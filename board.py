@@ -1,8 +1,10 @@
-import random
-import numpy
-from timer import Timer
 from utilities import CandidateManager, Point, Move, Candidate
 from stones import Stone
+from patterns import PatternTable, DEFAULT_PATTERN_TABLE, encode_line
+from zobrist import ZobristTable, zobrist_table
+
+# The low bit of every point of a line code, set under white and black stones alike
+LOW_BITS = sum(1 << (2 * position) for position in range(64))
 
 class InvalidMoveError(Exception):
     pass
@@ -10,29 +12,13 @@ class InvalidMoveError(Exception):
 class NoMoveToCancelError(Exception):
     pass
 
-class Move:
-    def __init__(self, x: int, y: int, stone: Stone, candidates_added: list[Candidate]):
-        self.point: Point =  Point(x, y)
-        self.player: Stone = stone
-        self.candidates_added: list[Candidate] = candidates_added
-        self.took_candidate_place_white: bool = False
-        self.took_candidate_place_black: bool = False
-
-    def __eq__(self, other):
-        if not isinstance(other, Move):
-            return False
-        return (self.point.x == other.point.x 
-                and self.point.y == other.point.y 
-                and self.player == other.player)
-
-    def __str__(self):
-        if self.player == 1:
-            return f"Point:({self.point.x},{self.point.y}), Player: White"
-        else:
-            return f"Point:({self.point.x},{self.point.y}), Player: Black"
-
 class Board:
-    def __init__(self, board_size):
+    """A Gomoku board which keeps its hash, candidates and line scores up to date as stones are placed and cancelled
+
+    Moves are recorded in flat undo logs of integers rather than as objects: the point of every move as
+    y * board_size + x, the player of every move, and the line scores every move replaced.
+    """
+    def __init__(self, board_size, pattern_table: PatternTable = DEFAULT_PATTERN_TABLE):
         self.candidates_manager: CandidateManager = CandidateManager(board_size)
         
         self.min_x = float('inf')
@@ -44,86 +30,82 @@ class Board:
         self.current_player: int = Stone.WHITE
         self.board_size: int = board_size
         self.board: list[list[int]] = [[0 for _ in range(self.board_size)] for _ in range(self.board_size)]
-        self.zobrist_table: list[list[list[int]]] = self.generate_zobrist_table()
-        self.move_stack: list[Move] = []
+        self.zobrist_table: ZobristTable = self.generate_zobrist_table()
+        self.moves: list[int] = []
+        self.move_players: list[Stone] = []
+        self.score_log: list[int] = []
         self.hash_for_board: int = 0
-        self.transposition_table: dict[int, int] = {}
 
-        self.num_of_elements_in_rows: numpy.ndarray = numpy.zeros((self.board_size), dtype=int)
-        self.num_of_elements_in_cols: numpy.ndarray = numpy.zeros((self.board_size), dtype=int)
-        self.num_of_elements_in_left_diagonals: numpy.ndarray = numpy.zeros((2*self.board_size-1), dtype=int)
-        self.num_of_elements_in_right_diagonals: numpy.ndarray = numpy.zeros((2*self.board_size-1), dtype=int)
-        
-        self.directions: list[tuple[int, int]] = [
-            (-1, 0), #left
-            (1, 0),  #right                        
-            (0, 1), #down
-            (0, -1), #up
-            (-1, -1),#left up
-            (1, -1), #right up
-            (-1, 1), 
-            (1, 1) #right down
-        ]
-
-        self.pattern_score = {
-            
-            (1, 1, 1, 1, 1): 1000000, 
-
-          
-            (0, 1, 1, 1, 1, 0): 100000,       
-            
-            
-            (1, 1, 1, 1, 0): 10000,               
-            (0, 1, 1, 1, 1): 10000,
-            (1, 1, 1, 0, 1): 10000,
-            (1, 1, 0, 1, 1): 10000,
-            (1, 0, 1, 1, 1): 10000,
-            (0, 1, 1, 1, -1): 10000,
-            (-1, 1, 1, 1, 0): 10000,
-
-            
-            (0, 1, 1, 1, 0): 5000,               
-            (0, 1, 0, 1, 1, 0): 5000,            
-
-           
-            (1, 1, 1, 0): 1000,
-            (0, 1, 1, 1): 1000,
-            (1, 1, 0, 1, 0): 1000,
-            (0, 1, 0, 1, 1): 1000,
-            (0, 1, 1, 0, 1): 1000,
-
-            
-            (0, 1, 1, 0): 500,
-            (0, 1, 0, 1, 0): 500,
-     
-            (1, 1, 0): 100,
-            (0, 1, 1): 100,
-            (1, 0, 1): 100,
-        }
-
-
-    def get_stone_index_for_hashing(self, stone: Stone):
-        """Returns the position for Zobrist hashing"""
-        if stone == Stone.EMPTY:
-            return 0
-        if stone == Stone.BLACK:
-            return 1
-        if stone == Stone.WHITE:
-            return 2
-        
-    def generate_zobrist_table(self) -> list[list[int, int]]:
-        """Generates a Zobrist table consisting of n times n times 3 different 64 bits"""
-        output_table = [[[random.getrandbits(64) for _ in range(3)] for _ in range(self.board_size)] for _ in range(self.board_size)]
-        return output_table
+        # Hashes of the position turned and mirrored by each symmetry of the zobrist table, the first being the position itself
+        self.symmetry_hashes: list[int] = [0] * 8
+
+        self.num_of_elements_in_rows: list[int] = [0] * self.board_size
+        self.num_of_elements_in_cols: list[int] = [0] * self.board_size
+        self.num_of_elements_in_left_diagonals: list[int] = [0] * (2 * self.board_size - 1)
+        self.num_of_elements_in_right_diagonals: list[int] = [0] * (2 * self.board_size - 1)
         
-    def initialize_hashing_for_board(self) -> int:
-        """The first hash of the board when no pieces are placed"""
-        hashed_value = 0
-        for y in range(self.board_size):
-            for x in range(self.board_size):
-                stone = self.board[y][x]
-                hashed_value ^= self.zobrist_table[y][x][self.get_stone_index_for_hashing(stone)]
-        self.hash_for_board = hashed_value
+
+        self.pattern_table: PatternTable = pattern_table
+        self.pattern_score: dict[tuple[int, ...], int] = pattern_table.pattern_score
+
+        self.lines: list[list[tuple[int, int]]] = self.generate_lines()
+        self.line_lengths: list[int] = [len(line) for line in self.lines]
+        self.lines_through: list[list[tuple[tuple[int, int], ...]]] = self.generate_lines_through()
+        self.line_codes: list[int] = [0 for _ in self.lines]
+        self.line_scores: list[int] = [0 for _ in self.lines]
+        self.score: int = 0
+
+    @property
+    def move_stack(self) -> list[Move]:
+        """The moves played so far, built from the undo logs on every access, so loops read moves and move_players instead"""
+        n = self.board_size
+        return [Move(cell % n, cell // n, player) for cell, player in zip(self.moves, self.move_players)]
+
+    def last_move(self) -> Move:
+        """Returns the last move made, or None on an empty board"""
+        if not self.moves:
+            return None
+        y, x = divmod(self.moves[-1], self.board_size)
+        return Move(x, y, self.move_players[-1])
+
+    def last_player(self) -> Stone:
+        """Returns the player who made the last move, or None on an empty board"""
+        return self.move_players[-1] if self.move_players else None
+
+    def generate_zobrist_table(self) -> ZobristTable:
+        """Returns the seeded Zobrist table shared by every board of this size"""
+        return zobrist_table(self.board_size)
+
+    def initialize_hashing_for_board(self):
+        """Computes the hashes of the board from scratch"""
+        self.symmetry_hashes = self.zobrist_table.hashes(self.board)
+        self.hash_for_board = self.symmetry_hashes[0]
+
+    def update_hashes(self, x: int, y: int, stone: Stone):
+        """Toggles a stone at (x,y) in the hash of the board under every symmetry
+
+        The eight hashes are updated in place and unrolled, since this runs on every place and cancel of the search.
+        """
+        keys = self.zobrist_table.symmetric_keys[2 * (y * self.board_size + x) + (stone == Stone.BLACK)]
+        hashes = self.symmetry_hashes
+        hashes[0] ^= keys[0]
+        hashes[1] ^= keys[1]
+        hashes[2] ^= keys[2]
+        hashes[3] ^= keys[3]
+        hashes[4] ^= keys[4]
+        hashes[5] ^= keys[5]
+        hashes[6] ^= keys[6]
+        hashes[7] ^= keys[7]
+        self.hash_for_board = hashes[0]
+
+    def canonical_hash(self) -> int:
+        """Returns the same key for a position and all of its turned and mirrored versions"""
+        return min(self.symmetry_hashes)
+
+    def canonical_symmetry(self) -> int:
+        """Returns the index of the symmetry turning the position into the one canonical_hash belongs to"""
+        hashes = self.symmetry_hashes
+        return hashes.index(min(hashes))
 
 
     def update_box(self, x: int, y: int):
@@ -140,42 +122,19 @@ class Board:
 
     def place(self, x: int, y: int) -> bool:
         """Place a stone at (x,y) for the current player"""
-        self.hash_for_board ^= self.zobrist_table[y][x][self.get_stone_index_for_hashing(self.board[y][x])] # hash out the original value
-        self.hash_for_board ^= self.zobrist_table[y][x][self.get_stone_index_for_hashing(self.current_player)] #hash in the new value
-        
+        self.update_hashes(x, y, self.current_player)
+
         #Set board to have the current player at x,y
         self.board[y][x] = Stone.WHITE if self.current_player == Stone.WHITE else Stone.BLACK
 
         self.update_box(x, y)
         
-        #If placed at x,y then obviously that place can no longer be a candidate
-        self.candidates_manager.candidate_points_black[y][x] = False
-        self.candidates_manager.candidate_points_white[y][x] = False
-        
-        # Add candidates
-        candidates_added = []
-        for i in range(1, 3):
-            for direction in self.directions:
-                if not self.in_bounds(x + direction[0] * i, y+ direction[1] * i):
-                    continue
-                
-                
-                candidate_point = Point(x + direction[0] * i, y + direction[1] * i)
-                if self.board[candidate_point.y][candidate_point.x] == Stone.EMPTY and not self.candidates_manager.is_a_candidate(candidate_point, self.current_player):
-                    candidates_added.append(candidate_point)
-                    self.candidates_manager.add_candidate_for_player(candidate_point, self.current_player)
-                
-
-        # Removing the candidate at the position which the stone is placed
-        move_to_add = Move(x, y, self.current_player, candidates_added)
-
-        if self.candidates_manager.remove_candidate_from_player(move_to_add.point, Stone.WHITE):
-            move_to_add.took_candidate_place_white = True
-
-        if self.candidates_manager.remove_candidate_from_player(move_to_add.point, Stone.BLACK):
-            move_to_add.took_candidate_place_black = True
-        
-        self.move_stack.append(move_to_add)
+        #If placed at x,y then obviously that place can no longer be a candidate, while the points around it become candidates
+        self.candidates_manager.place_stone(x, y, self.current_player)
+
+        self.update_line_scores(x, y)
+        self.moves.append(y * self.board_size + x)
+        self.move_players.append(self.current_player)
 
         #Clean up and stats
         self.current_player = Stone(self.current_player * -1)
@@ -194,30 +153,22 @@ class Board:
 
     def cancel(self) -> bool:
         """Cancels the last move made"""
-        if not self.move_stack:
+        if not self.moves:
             return
         
-        last_move = self.move_stack.pop()
-        player = last_move.player
-        y = last_move.point.y
-        x = last_move.point.x
-        candidates_last_added =  last_move.candidates_added
-        
+        y, x = divmod(self.moves.pop(), self.board_size)
+        player = self.move_players.pop()
 
-        self.hash_for_board ^= self.zobrist_table[y][x][self.get_stone_index_for_hashing(self.board[y][x])] # hash out original value
-        self.hash_for_board ^= self.zobrist_table[y][x][self.get_stone_index_for_hashing(Stone.EMPTY)] #hash in the new value
+        self.update_hashes(x, y, self.board[y][x])
 
         self.board[y][x] = Stone.EMPTY
+        self.update_line_codes(x, y)
+        self.restore_line_scores(x, y)
 
-        for candidate in candidates_last_added:
-            self.candidates_manager.remove_candidate_from_player(candidate, player)
-        
-        if last_move.took_candidate_place_black:
-            self.candidates_manager.add_candidate_for_player(Point(x, y), Stone.BLACK)
-        if last_move.took_candidate_place_white:
-            self.candidates_manager.add_candidate_for_player(Point(x, y), Stone.WHITE)
+        self.candidates_manager.remove_stone(x, y, player)
         
-        self.current_player = Stone(-1*self.current_player)
+        # The player of the cancelled move is to move again, also when stones were placed out of turn
+        self.current_player = player
 
         self.num_of_elements_in_rows[y] -= 1
         self.num_of_elements_in_cols[x] -= 1
@@ -231,17 +182,48 @@ class Board:
 
         return True
     
+    def copy(self) -> 'Board':
+        """Returns a board of the same class at the same position, sharing the Zobrist table so both hash positions alike
+
+        Boards of the same size share their table anyway, unless one was given a table of its own.
+        """
+        board = type(self)(self.board_size, self.pattern_table)
+        board.zobrist_table = self.zobrist_table
+        n = self.board_size
+        for cell, player in zip(self.moves, self.move_players):
+            board.current_player = player
+            board.place(cell % n, cell // n)
+        board.current_player = self.current_player
+        return board
+
     def reset(self) -> bool:
         """Resets the board"""
-        if not self.move_stack:
+        if not self.moves:
             raise NoMoveToCancelError("No move to cancel.")
         
         self.board =  [[0 for _ in range(self.board_size)] for _ in range(self.board_size)]
-        self.move_stack = []
+        self.moves = []
+        self.move_players = []
+        self.score_log = []
         self.candidates_manager = CandidateManager(self.board_size)
         self.hash_for_board = 0
+        self.symmetry_hashes = [0] * 8
         self.current_player = Stone.WHITE
 
+        self.min_x = float('inf')
+        self.max_x = float('-inf')
+        self.min_y = float('inf')
+        self.max_y = float('-inf')
+
+        self.num_of_elements_in_rows = [0] * self.board_size
+        self.num_of_elements_in_cols = [0] * self.board_size
+        self.num_of_elements_in_left_diagonals = [0] * (2 * self.board_size - 1)
+        self.num_of_elements_in_right_diagonals = [0] * (2 * self.board_size - 1)
+
+        self.line_codes = [0 for _ in self.lines]
+        self.line_scores = [0 for _ in self.lines]
+        self.score = 0
+
         return True
 
 
@@ -279,103 +261,86 @@ class Board:
     
     def evaluate_board(self) -> int:
         """Gives a score of the current board"""
-        with Timer('Evaluation'):
-            if self.hash_for_board in self.transposition_table:
-                return self.transposition_table[self.hash_for_board]
-            
-            white_score = (self.evaluate_horizontals(Stone.WHITE) 
-                        + self.evaluate_verticals(Stone.WHITE) 
-                        + self.evaluate_diagonals(Stone.WHITE))
-
-
-            black_score = (self.evaluate_horizontals(Stone.BLACK)
-                        + self.evaluate_verticals(Stone.BLACK)
-                        + self.evaluate_diagonals(Stone.BLACK))
-     
-            self.transposition_table[self.hash_for_board] = white_score - black_score
-        return self.transposition_table[self.hash_for_board]
-           
-
-    def evaluate_left_diagonals(self, player: Stone) -> int:
-        """Evaluate the possible left diagonals"""
-        score = 0
-        mid_line = self.board_size - 1
-        for index in range(4, len(self.num_of_elements_in_left_diagonals)-4): 
-            if self.num_of_elements_in_left_diagonals[index] >= 2:
-                if index <= mid_line: 
-                    start_y = -index + self.board_size  - 1
-                    line = [self.board[start_y + i][i] for i in range(index + 1)]
-                    score += self.score_line(line, player)
-                
-                else: 
-                    start_x = index - self.board_size + 1
-                    line = [self.board[i][start_x + i] for i in range(2 * mid_line + 1- index)]
-                    score += self.score_line(line, player)   
-
-
-        return score
-    
-    def evaluate_right_diagonals(self, player: Stone) -> int:
-        """Evaluate the possible right diagonals"""
-        score = 0
-        mid_line = self.board_size - 1
-        for index in range(4, len(self.num_of_elements_in_right_diagonals)-4): 
-            if self.num_of_elements_in_right_diagonals[index] >= 2:
-                if index <= mid_line: 
-                    start_y = index
-                    line = [self.board[start_y-i][i] for i in range(index + 1)]
-                    score += self.score_line(line, player)
-                
-                else:
-                    start_x = self.board_size - index + 1
-                    line = [self.board[self.board_size-1-i][start_x + i] for i in range(2 * mid_line + 1- index)]
-                    score += self.score_line(line, player)
-            
-        return score
-    
-    def evaluate_horizontals(self, player: Stone) -> int:
-        """Evaluate the possible horizontals"""
-        score = 0
-
-        # for y in range(self.board_size):
-        #     score += self.score_line(self.board[y], player)
-
-        for y in range(self.min_y, self.max_y + 1):
-            if self.num_of_elements_in_rows[y] >= 2:
-                score += self.score_line(self.board[y], player)
-
-        return score
-
-    def evaluate_verticals(self, player: Stone) -> int:
-        """Evaluate the possible verticals"""
-        score = 0
-        for x in range(self.min_x, self.max_x + 1):
-            if self.num_of_elements_in_cols[x] >= 2:
-                col = [self.board[y][x] for y in range(self.board_size)]
-                score += self.score_line(col, player)
-
-        return score
-    
-    def evaluate_diagonals(self, player: Stone) -> int:
-        """Combining the score of the diagonal evaluations"""
-        score = self.evaluate_left_diagonals(player)
-        score += self.evaluate_right_diagonals(player)
-        return score
-    
-    
+        return self.score
+
+    def generate_lines(self) -> list[list[tuple[int, int]]]:
+        """Lists the cells of every row, column and diagonal long enough to hold five in a row"""
+        n = self.board_size
+        lines = [[(x, y) for x in range(n)] for y in range(n)]
+        lines += [[(x, y) for y in range(n)] for x in range(n)]
+
+        for index in range(2 * n - 1):
+            # Left diagonal with x - y = index - (n - 1), gathered from left to right
+            start_x, start_y = max(0, index - n + 1), max(0, n - 1 - index)
+            lines.append([(start_x + i, start_y + i) for i in range(n - max(start_x, start_y))])
+
+        for index in range(2 * n - 1):
+            # Right diagonal with x + y = index, gathered from left to right
+            start_x, start_y = max(0, index - n + 1), min(index, n - 1)
+            lines.append([(start_x + i, start_y - i) for i in range(start_y - start_x + 1)])
+
+        return [line for line in lines if len(line) >= 5]
+
+    def generate_lines_through(self) -> list[list[tuple[tuple[int, int], ...]]]:
+        """Maps every cell to the indices of the lines passing through it and its position on each of them"""
+        lines_through = [[() for _ in range(self.board_size)] for _ in range(self.board_size)]
+        for index, line in enumerate(self.lines):
+            for position, (x, y) in enumerate(line):
+                lines_through[y][x] += ((index, position),)
+        return lines_through
+
+    def update_line_codes(self, x: int, y: int):
+        """Writes the stone at (x,y) into the encodings of the lines through it"""
+        stone_code = self.board[y][x] & 3
+        for index, position in self.lines_through[y][x]:
+            shift = 2 * position
+            self.line_codes[index] = (self.line_codes[index] & ~(3 << shift)) | (stone_code << shift)
+
+    def score_line_at(self, index: int) -> int:
+        """Scores a line for white minus black"""
+        return self.pattern_table.score_code(self.line_codes[index], self.line_lengths[index])
+
+    def line_score_for(self, index: int, player: Stone) -> int:
+        """Scores a line for one player alone, which the net score of the line can hide"""
+        table = self.pattern_table.white_table if player == Stone.WHITE else self.pattern_table.black_table
+        return self.pattern_table.score_code(self.line_codes[index], self.line_lengths[index], table)
+
+    def stones_on_line(self, index: int, player: Stone) -> int:
+        """Counts the stones of a player on a line from its code, the high bit of a point being set only under black"""
+        code = self.line_codes[index]
+        black = ((code >> 1) & LOW_BITS).bit_count()
+        return black if player == Stone.BLACK else (code & LOW_BITS).bit_count() - black
+
+    def recompute_line_scores(self):
+        """Rescores every line of the board from scratch"""
+        self.line_codes = [encode_line([self.board[y][x] for x, y in line]) for line in self.lines]
+        self.line_scores = [self.score_line_at(index) for index in range(len(self.lines))]
+        self.score = sum(self.line_scores)
+
+    def update_line_scores(self, x: int, y: int):
+        """Rescores the lines through (x,y), pushing the previous scores onto the score log"""
+        self.update_line_codes(x, y)
+        line_scores = self.line_scores
+        score_log = self.score_log
+        for index, _ in self.lines_through[y][x]:
+            old_score = line_scores[index]
+            new_score = self.score_line_at(index)
+            score_log.append(old_score)
+            line_scores[index] = new_score
+            self.score += new_score - old_score
+
+    def restore_line_scores(self, x: int, y: int):
+        """Pops the scores pushed by update_line_scores for (x,y) back into the lines through it"""
+        line_scores = self.line_scores
+        score_log = self.score_log
+        for index, _ in reversed(self.lines_through[y][x]):
+            old_score = score_log.pop()
+            self.score += old_score - line_scores[index]
+            line_scores[index] = old_score
     
-    def score_line(self, line: list[Stone], player: Stone) -> float:
-        stones = [(1 if s == player else -1 if s != Stone.EMPTY else 0) for s in line]
-        score = 0
-        max_len = max(len(pat) for pat in self.pattern_score)
-
-        for window_size in range(3, max_len + 1):
-            for i in range(len(stones) - window_size + 1):
-                window = tuple(stones[i:i + window_size])
-                if window in self.pattern_score:
-                    val = self.pattern_score[window]
-                    score += val
-        return score
+    def score_line(self, line: list[Stone], player: Stone) -> int:
+        """Scores a line for one player with the compiled pattern table"""
+        return self.pattern_table.score_for(line, player)
 
 if __name__ == '__main__':
     print("Hello")
\ No newline at end of file
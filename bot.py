@@ -1,9 +1,152 @@
+import time
+import threading
+from board import Board
+from utilities import Candidate
+from instrumentation import SearchStatistics
+from timer import Timer
+from profiling import SearchProfiler
+from contextlib import nullcontext
+from opening_book import OpeningBook
 from strategies import minimax
+from strategies import threat_search
+
+# Share of a move given to the threat search before minimax, and its cap in seconds
+THREAT_SEARCH_SHARE = 0.2
+MAX_THREAT_SEARCH_TIME = 0.5
 
 
 class Bot:
-    def __init__(self):
-        self.minimax: minimax.Minimax = minimax.Minimax()
+    def __init__(self, time_limit: float = 2.0, workers: int = 1, collect_statistics: bool = False,
+                 profiler: SearchProfiler = None, ponder: bool = False, book: OpeningBook = None):
+        """With more than one worker the search is spread over a pool of processes, with collect_statistics every move keeps a
+        SearchStatistics, with a profiler every move is profiled into its own collapsed stack file, with ponder the bot
+        searches the reply it expects while the opponent thinks, and with a book the bot plays its moves without searching"""
+        if workers > 1:
+            from strategies import parallel
+            self.minimax: minimax.Minimax = parallel.ParallelMinimax(workers)
+        else:
+            self.minimax: minimax.Minimax = minimax.Minimax()
+        self.threat_search: threat_search.ThreatSearch = threat_search.ThreatSearch()
+        self.time_limit: float = time_limit
+        self.max_depth: int = minimax.MAX_SEARCH_DEPTH
+        self.collect_statistics: bool = collect_statistics
+        self.statistics: SearchStatistics = None
+        self.profiler: SearchProfiler = profiler
+        self.book: OpeningBook = book
+        self.book_moves: int = 0
+
+        # Pondering searches a copy of the board in a background thread, keeping the deepest result it completed
+        self.ponder: bool = ponder and isinstance(self.minimax, minimax.Minimax)
+        self.predicted_reply: tuple[int, int] = None
+        self.ponder_board: Board = None
+        self.ponder_thread: threading.Thread = None
+        self.ponder_stop: threading.Event = threading.Event()
+        self.ponder_result: tuple[int, tuple[int, Candidate]] = None
+        self.ponder_hits: int = 0
+        self.ponder_misses: int = 0
+
+    def choose_move(self, board: Board) -> tuple[int, Candidate]:
+        """Plays the book move of the position if there is one, then a forced win when the threat search finds one,
+        otherwise searches the position with minimax
+
+        The time limit covers the whole move: the threat search gets a share of it, and minimax what is left.
+        When the position is the one pondered, minimax carries on from the deepest depth the pondering completed.
+        """
+        start = time.perf_counter()
+        resume = self.stop_pondering(board)
+        statistics = SearchStatistics() if self.collect_statistics else None
+        self.statistics = statistics
+
+        if self.book is not None:
+            move = self.book.choose(board)
+            if move is not None:
+                self.book_moves += 1
+                self.predicted_reply = None
+                return board.evaluate_board(), Candidate(move[0], move[1], board.current_player)
+
+        with self.profiler.profile('move') if self.profiler is not None else nullcontext():
+            if self.time_limit is None:
+                self.threat_search.time_limit = MAX_THREAT_SEARCH_TIME
+            else:
+                self.threat_search.time_limit = min(MAX_THREAT_SEARCH_TIME, self.time_limit * THREAT_SEARCH_SHARE)
+            with Timer('threat_search', statistics):
+                forced_win = self.threat_search.run(board)
+            if forced_win is not None:
+                sequence = self.threat_search.winning_sequence
+                self.predicted_reply = (sequence[1].point.x, sequence[1].point.y) if len(sequence) > 1 else None
+                return forced_win
+
+            time_limit = None if self.time_limit is None else max(0.0, self.time_limit - (time.perf_counter() - start))
+            with Timer('minimax', statistics):
+                result = self.minimax.search(board, time_limit=time_limit, max_depth=self.max_depth,
+                                            statistics=statistics, resume=resume)
+
+        principal_variation = self.minimax.principal_variation
+        if len(principal_variation) > 1:
+            self.predicted_reply = (principal_variation[1] % board.board_size, principal_variation[1] // board.board_size)
+        else:
+            self.predicted_reply = None
+        return result
+
+    def start_pondering(self, board: Board):
+        """Starts searching, in the background, the position after the reply the last search expects from the opponent
+
+        Without an expected reply the best reply found by a one ply search is pondered. Does nothing unless the
+        bot was made with ponder.
+        """
+        if not self.ponder or self.ponder_thread is not None:
+            return
+        ponder_board = board.copy()
+        reply = self.predicted_reply
+        if reply is None or ponder_board.board[reply[1]][reply[0]] != 0:
+            _, candidate = self.minimax.run(1, ponder_board)
+            if candidate is None:
+                return
+            reply = (candidate.point.x, candidate.point.y)
+        ponder_board.place(*reply)
+
+        self.ponder_board = ponder_board
+        self.ponder_result = None
+        self.ponder_stop.clear()
+        self.ponder_thread = threading.Thread(target=self.run_pondering, daemon=True)
+        self.ponder_thread.start()
+
+    def run_pondering(self):
+        """Deepens the search of the pondered position until asked to stop"""
+        self.minimax.stop_requested = self.ponder_stop.is_set
+        try:
+            result = self.minimax.search(self.ponder_board)
+            self.ponder_result = (self.minimax.completed_depth, result)
+        finally:
+            self.minimax.stop_requested = None
+
+    def stop_pondering(self, board: Board = None) -> tuple[int, tuple[int, Candidate]]:
+        """Stops pondering, returns the completed depth and result to resume from if the board is at the pondered position
+
+        On a miss the transposition table keeps what pondering found, so only the result is thrown away.
+        """
+        if self.ponder_thread is None:
+            return None
+        self.ponder_stop.set()
+        self.ponder_thread.join()
+        self.ponder_thread = None
+
+        ponder_board, self.ponder_board = self.ponder_board, None
+        result, self.ponder_result = self.ponder_result, None
+        if board is None or result is None:
+            return None
+        if board.moves == ponder_board.moves and board.move_players == ponder_board.move_players \
+                and board.zobrist_table is ponder_board.zobrist_table:
+            self.ponder_hits += 1
+            return result
+        self.ponder_misses += 1
+        return None
+
+    def new_game(self):
+        """Clears everything the bot remembers from the previous game"""
+        self.stop_pondering()
+        self.predicted_reply = None
+        self.minimax.new_game()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,240 @@
+import sys
+import argparse
+import time
+
+# The engine only imports the board and the bot once a game starts, so it answers the manager right away
+ABOUT = 'name="Gomoku", version="1.0"'
+
+MIN_BOARD_SIZE = 5
+MAX_BOARD_SIZE = 32
+
+# Budgets in milliseconds used until the manager sends its own, as in the protocol
+DEFAULT_TIMEOUT_TURN = 30000
+DEFAULT_TIMEOUT_MATCH = 1000000000
+
+# Part of the remaining match time given to one move, and the time kept back for replying to the manager
+MOVES_TO_PLAN = 20
+SAFETY_FACTOR = 0.85
+OVERHEAD = 0.03
+MIN_MOVE_TIME = 0.02
+
+
+class Engine:
+    """A headless engine speaking the Gomocup (piskvork) protocol over text streams
+
+    Points are sent as x,y counted from 0 at the top left corner like the board. The engine plays
+    whichever colour the manager asks it to move for, white being the colour which moved first.
+    """
+    def __init__(self, input_stream=sys.stdin, output_stream=sys.stdout, book_path: str = None):
+        self.input_stream = input_stream
+        self.output_stream = output_stream
+        self.book_path: str = book_path
+        self.board = None
+        self.bot = None
+        self.engine_player = None
+
+        self.timeout_turn: int = DEFAULT_TIMEOUT_TURN
+        self.timeout_match: int = DEFAULT_TIMEOUT_MATCH
+        self.time_left: int = None
+        self.info: dict[str, str] = {}
+
+        self.commands = {
+            'START': self.start,
+            'RESTART': self.restart,
+            'TURN': self.turn,
+            'BEGIN': self.begin,
+            'BOARD': self.board_command,
+            'INFO': self.info_command,
+            'TAKEBACK': self.takeback,
+            'ABOUT': self.about,
+        }
+
+    def send(self, line: str):
+        self.output_stream.write(line + '\n')
+        self.output_stream.flush()
+
+    def run(self):
+        """Answers commands until END or the end of the input"""
+        for line in self.input_stream:
+            if not self.handle(line):
+                break
+
+    def handle(self, line: str) -> bool:
+        """Answers one command, returns false when the engine should exit"""
+        parts = line.strip().split(maxsplit=1)
+        if not parts:
+            return True
+        command = parts[0].upper()
+        argument = parts[1] if len(parts) > 1 else ''
+        if command == 'END':
+            return False
+
+        handler = self.commands.get(command)
+        if handler is None:
+            self.send(f'UNKNOWN command {command}')
+            return True
+        if handler not in (self.start, self.info_command, self.about) and self.board is None:
+            self.send('ERROR the game has not been started')
+            return True
+
+        try:
+            handler(argument)
+        except ValueError as error:
+            self.send(f'ERROR {error}')
+        return True
+
+    def start(self, argument: str):
+        size = int(argument)
+        if not MIN_BOARD_SIZE <= size <= MAX_BOARD_SIZE:
+            self.send(f'ERROR unsupported board size {size}')
+            return
+
+        self.new_game(size)
+        self.send('OK')
+
+    def restart(self, argument: str):
+        self.new_game(self.board.board_size)
+        self.send('OK')
+
+    def new_game(self, size: int):
+        """Sets up an empty board, forgetting what the bot learned in the previous game"""
+        from board import Board
+        from bot import Bot
+        self.board = Board(size)
+        if self.bot is None:
+            from opening_book import OpeningBook
+            self.bot = Bot(book=OpeningBook(self.book_path) if self.book_path else None)
+        else:
+            self.bot.new_game()
+        self.engine_player = None
+
+    def parse_point(self, text: str) -> tuple[int, int]:
+        """Reads x,y and checks that the point is empty"""
+        x, y = (int(value) for value in text.split(',')[:2])
+        if not (0 <= x < self.board.board_size and 0 <= y < self.board.board_size):
+            raise ValueError(f'point {x},{y} is off the board')
+        if self.board.board[y][x] != 0:
+            raise ValueError(f'point {x},{y} is not empty')
+        return x, y
+
+    def place_opponent(self, x: int, y: int):
+        from stones import Stone
+        if self.engine_player is None:
+            self.engine_player = Stone(-self.board.current_player)
+        self.board.current_player = Stone(-self.engine_player)
+        self.board.place(x, y)
+
+    def turn(self, argument: str):
+        x, y = self.parse_point(argument)
+        self.place_opponent(x, y)
+        self.think()
+
+    def begin(self, argument: str):
+        if self.engine_player is None:
+            self.engine_player = self.board.current_player
+        self.think()
+
+    def board_command(self, argument: str):
+        """Sets up a position from the lines x,y,owner sent until DONE, 1 being the engine and 2 the opponent, then moves"""
+        from stones import Stone
+        stones = []
+        for line in self.input_stream:
+            line = line.strip()
+            if line.upper() == 'DONE':
+                break
+            if line:
+                x, y, owner = (int(value) for value in line.split(',')[:3])
+                stones.append((x, y, owner))
+
+        self.new_game(self.board.board_size)
+        own = sum(1 for _, _, owner in stones if owner == 1)
+        self.engine_player = Stone.WHITE if own == len(stones) - own else Stone.BLACK
+        for x, y, owner in stones:
+            x, y = self.parse_point(f'{x},{y}')
+            if owner not in (1, 2):
+                raise ValueError(f'unknown owner {owner} of point {x},{y}')
+            self.board.current_player = self.engine_player if owner == 1 else Stone(-self.engine_player)
+            self.board.place(x, y)
+        self.think()
+
+    def takeback(self, argument: str):
+        x, y = (int(value) for value in argument.split(',')[:2])
+        cell = y * self.board.board_size + x
+        if cell not in self.board.moves:
+            raise ValueError(f'there is no stone at {x},{y}')
+
+        if self.board.moves[-1] == cell:
+            self.board.cancel()
+        else:
+            # Taking back an older stone replays the others onto a new board
+            stones = [(move, player) for move, player in zip(self.board.moves, self.board.move_players) if move != cell]
+            board_class = type(self.board)
+            self.board = board_class(self.board.board_size)
+            for move, player in stones:
+                self.board.current_player = player
+                self.board.place(move % self.board.board_size, move // self.board.board_size)
+        self.send('OK')
+
+    def info_command(self, argument: str):
+        parts = argument.split(maxsplit=1)
+        if len(parts) < 2:
+            return
+        key, value = parts[0].lower(), parts[1]
+        self.info[key] = value
+        if key == 'timeout_turn':
+            self.timeout_turn = int(value)
+        elif key == 'timeout_match':
+            self.timeout_match = int(value)
+        elif key == 'time_left':
+            self.time_left = int(value)
+
+    def about(self, argument: str):
+        self.send(ABOUT)
+
+    def move_time(self) -> float:
+        """Returns the seconds the next move may take within the turn and match budgets
+
+        A turn timeout of 0 asks for a move as fast as possible, and a match timeout of 0 means no limit.
+        """
+        budget = self.timeout_turn / 1000 if self.timeout_turn > 0 else MIN_MOVE_TIME
+        if self.timeout_match > 0:
+            time_left = self.time_left if self.time_left is not None else self.timeout_match
+            budget = min(budget, time_left / 1000 / MOVES_TO_PLAN)
+        return max(MIN_MOVE_TIME, budget * SAFETY_FACTOR - OVERHEAD)
+
+    def think(self):
+        """Searches for the move of the engine, plays it and sends it"""
+        start = time.perf_counter()
+        self.board.current_player = self.engine_player
+        self.bot.time_limit = self.move_time()
+
+        _, move = self.bot.choose_move(self.board)
+        if move is None:
+            x, y = self.fallback_move()
+        else:
+            x, y = move.point.x, move.point.y
+        self.board.place(x, y)
+
+        if self.time_left is not None:
+            self.time_left -= int((time.perf_counter() - start) * 1000)
+        self.send(f'{x},{y}')
+
+    def fallback_move(self) -> tuple[int, int]:
+        """Returns the empty point closest to the centre, for positions without candidates"""
+        size = self.board.board_size
+        centre = (size - 1) / 2
+        empty = [(x, y) for y in range(size) for x in range(size) if self.board.board[y][x] == 0]
+        if not empty:
+            raise ValueError('the board is full')
+        return min(empty, key=lambda point: (point[0] - centre) ** 2 + (point[1] - centre) ** 2)
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description='Plays Gomoku over the Gomocup protocol on standard input and output')
+    parser.add_argument('--book', help='opening book to play from before searching')
+    args = parser.parse_args(argv)
+    Engine(book_path=args.book).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -5,7 +5,7 @@ from bot import Bot
 class Gomoku:
     def __init__(self, board_size: int):
         self.board: Board = Board(board_size)
-        self.bot: Bot = Bot() 
+        self.bot: Bot = Bot(ponder=True)
         self.user_interface: UI = UI(self.board, self.bot)
         
     
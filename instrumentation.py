@@ -0,0 +1,80 @@
+import json
+
+# Deepest ply the per depth histograms have room for
+MAX_PLY = 128
+
+
+class SearchStatistics:
+    """Counters and histograms of a single search, aggregated in memory
+
+    A search records into its statistics only when it has been given some. Without them the search pays
+    one check against None at each place it would count something, and never reads the clock or prints.
+    """
+    def __init__(self):
+        self.nodes: int = 0
+        self.leaves: int = 0
+        self.tt_probes: int = 0
+        self.tt_hits: int = 0
+        self.tt_cutoffs: int = 0
+        self.researches: int = 0
+        self.aspiration_failures: int = 0
+        self.quiescence_nodes: int = 0
+        self.futility_prunes: int = 0
+        self.nodes_per_depth: list[int] = [0] * MAX_PLY
+        self.cutoffs_per_depth: list[int] = [0] * MAX_PLY
+
+        # Number of expanded nodes by the number of candidates they had
+        self.branching: dict[int, int] = {}
+
+        self.iteration_nodes: dict[int, int] = {}
+        self.iteration_times: dict[int, float] = {}
+        self.phase_times: dict[str, float] = {}
+
+    def count_branching(self, num_of_candidates: int):
+        """Records the number of candidates of an expanded node"""
+        self.branching[num_of_candidates] = self.branching.get(num_of_candidates, 0) + 1
+
+    def end_iteration(self, depth: int, nodes: int, seconds: float):
+        """Records the nodes and time of one completed iteration of iterative deepening"""
+        self.iteration_nodes[depth] = nodes
+        self.iteration_times[depth] = seconds
+
+    def add_phase_time(self, phase: str, seconds: float):
+        """Adds time spent in a phase such as the threat search or the minimax search"""
+        self.phase_times[phase] = self.phase_times.get(phase, 0.0) + seconds
+
+    def effective_branching_factor(self) -> float:
+        """Returns the ratio between the nodes of the last two completed iterations, or 0 before there are two"""
+        depths = sorted(self.iteration_nodes)
+        if len(depths) < 2 or not self.iteration_nodes[depths[-2]]:
+            return 0.0
+        return self.iteration_nodes[depths[-1]] / self.iteration_nodes[depths[-2]]
+
+    def summary(self) -> dict:
+        """Returns the statistics as a dictionary of plain values"""
+        deepest = max((depth for depth in range(MAX_PLY) if self.nodes_per_depth[depth] or self.cutoffs_per_depth[depth]), default=-1)
+        seconds = sum(self.iteration_times.values())
+        return {
+            'nodes': self.nodes,
+            'leaves': self.leaves,
+            'nodes_per_second': self.nodes / seconds if seconds else 0.0,
+            'tt_probes': self.tt_probes,
+            'tt_hits': self.tt_hits,
+            'tt_hit_rate': self.tt_hits / self.tt_probes if self.tt_probes else 0.0,
+            'tt_cutoffs': self.tt_cutoffs,
+            'researches': self.researches,
+            'aspiration_failures': self.aspiration_failures,
+            'quiescence_nodes': self.quiescence_nodes,
+            'futility_prunes': self.futility_prunes,
+            'nodes_per_depth': self.nodes_per_depth[:deepest + 1],
+            'cutoffs_per_depth': self.cutoffs_per_depth[:deepest + 1],
+            'branching': {str(size): count for size, count in sorted(self.branching.items())},
+            'iterations': [{'depth': depth, 'nodes': self.iteration_nodes[depth], 'seconds': self.iteration_times[depth]}
+                           for depth in sorted(self.iteration_nodes)],
+            'effective_branching_factor': self.effective_branching_factor(),
+            'phase_times': dict(self.phase_times),
+        }
+
+    def to_json(self) -> str:
+        """Returns the summary as JSON"""
+        return json.dumps(self.summary())
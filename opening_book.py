@@ -0,0 +1,243 @@
+import os
+import sys
+import mmap
+import json
+import random
+import struct
+import argparse
+from stones import Stone
+from board import Board
+
+# A book starts with its magic, format version, board size and number of entries
+BOOK_MAGIC = b'GMKBOOK\0'
+BOOK_VERSION = 1
+HEADER = struct.Struct('<8sHHQ')
+
+# Every entry is a canonical position hash, a move in the canonical orientation and its weight
+ENTRY = struct.Struct('<QHI')
+MAX_WEIGHT = 0xFFFFFFFF
+
+# Defaults of the builder: plies of every game read into the book, and moves kept per position
+BOOK_PLIES = 10
+BOOK_MOVES = 4
+
+PLAYER_NAMES = {'white': Stone.WHITE, 'black': Stone.BLACK}
+
+
+class OpeningBook:
+    """A read only opening book memory mapped from a file and searched in place
+
+    The file holds fixed size entries sorted by the canonical hash of their position, so a lookup is a
+    binary search over the mapping and nothing is read into memory up front. Moves are kept in the
+    orientation of the canonical position, and mapped back through the symmetry which turns the board
+    into it, so one entry serves a position and all of its turned and mirrored versions. Processes
+    opening the same book share its pages.
+    """
+    def __init__(self, path: str):
+        self.path: str = path
+        self.file = open(path, 'rb')
+        try:
+            self.data: mmap.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise ValueError(f'{path} is not an opening book')
+
+        if len(self.data) < HEADER.size:
+            self.close()
+            raise ValueError(f'{path} is not an opening book')
+        magic, version, board_size, count = HEADER.unpack_from(self.data, 0)
+        if magic != BOOK_MAGIC or version != BOOK_VERSION or len(self.data) != HEADER.size + count * ENTRY.size:
+            self.close()
+            raise ValueError(f'{path} is not an opening book of version {BOOK_VERSION}')
+        self.board_size: int = board_size
+        self.count: int = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __enter__(self) -> 'OpeningBook':
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    def close(self):
+        if not self.data.closed:
+            self.data.close()
+        self.file.close()
+
+    def key_at(self, index: int) -> int:
+        return struct.unpack_from('<Q', self.data, HEADER.size + index * ENTRY.size)[0]
+
+    def entries(self, key: int) -> list[tuple[int, int]]:
+        """Returns the moves stored for a canonical hash with their weights, in the canonical orientation"""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        entries = []
+        while low < self.count:
+            entry_key, cell, weight = ENTRY.unpack_from(self.data, HEADER.size + low * ENTRY.size)
+            if entry_key != key:
+                break
+            entries.append((cell, weight))
+            low += 1
+        return entries
+
+    def moves(self, board: Board) -> list[tuple[int, int, int]]:
+        """Returns the book moves of a position as (x, y, weight), heaviest first, leaving out occupied points"""
+        if board.board_size != self.board_size:
+            return []
+        symmetry = board.canonical_symmetry()
+        table = board.zobrist_table
+        moves = []
+        for cell, weight in self.entries(board.canonical_hash()):
+            if cell >= self.board_size * self.board_size:
+                continue
+            y, x = divmod(table.untransform(cell, symmetry), self.board_size)
+            if board.board[y][x] == Stone.EMPTY:
+                moves.append((x, y, weight))
+        moves.sort(key=lambda move: move[2], reverse=True)
+        return moves
+
+    def choose(self, board: Board, rng: random.Random = None) -> tuple[int, int]:
+        """Returns the heaviest book move of a position, or one drawn by weight when given a random generator"""
+        moves = self.moves(board)
+        if not moves:
+            return None
+        if rng is None:
+            x, y, _ = moves[0]
+        else:
+            x, y, _ = rng.choices(moves, weights=[weight for _, _, weight in moves])[0]
+        return x, y
+
+
+class BookBuilder:
+    """Counts the moves played from every position of the first plies of games and writes them as a book
+
+    A move weighs one for each game it was played in, and one more when the player who made it went on
+    to win. Positions are counted by canonical hash, so symmetric openings add up.
+    """
+    def __init__(self, board_size: int, plies: int = BOOK_PLIES):
+        self.board_size: int = board_size
+        self.plies: int = plies
+        self.board: Board = Board(board_size)
+        self.positions: dict[int, dict[int, int]] = {}
+        self.games: int = 0
+
+    def add_game(self, moves: list[tuple[int, int]], winner: Stone = None):
+        """Adds the first plies of a game given as (x, y) moves, the first one played by white"""
+        board = self.board
+        table = board.zobrist_table
+        try:
+            for x, y in moves[:self.plies]:
+                if not board.in_bounds(x, y) or board.board[y][x] != Stone.EMPTY:
+                    raise ValueError(f'illegal move {x},{y} at ply {len(board.moves) + 1}')
+                cell = table.transform(y * self.board_size + x, board.canonical_symmetry())
+                counts = self.positions.setdefault(board.canonical_hash(), {})
+                counts[cell] = counts.get(cell, 0) + 1 + (winner == board.current_player)
+                board.place(x, y)
+        finally:
+            while board.moves:
+                board.cancel()
+        self.games += 1
+
+    def write(self, path: str, max_moves: int = BOOK_MOVES, min_weight: int = 1) -> int:
+        """Writes the heaviest moves of every position to a book, replacing the file at once, and returns the entries written"""
+        entries = []
+        for key, counts in self.positions.items():
+            best = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:max_moves]
+            entries.extend((key, cell, min(weight, MAX_WEIGHT)) for cell, weight in best if weight >= min_weight)
+        entries.sort()
+
+        temporary = f'{path}.tmp'
+        with open(temporary, 'wb') as file:
+            file.write(HEADER.pack(BOOK_MAGIC, BOOK_VERSION, self.board_size, len(entries)))
+            for entry in entries:
+                file.write(ENTRY.pack(*entry))
+        os.replace(temporary, path)
+        return len(entries)
+
+
+def read_records(path: str):
+    """Yields (moves, winner) from a file of games, one per line
+
+    A line is either a JSON object with "moves" as a list of [x, y] and an optional "winner" of "white"
+    or "black", or the moves written as x,y separated by spaces.
+    """
+    with open(path) as file:
+        for line in file:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith('{'):
+                record = json.loads(line)
+                moves = [(int(x), int(y)) for x, y in record['moves']]
+                yield moves, PLAYER_NAMES.get(record.get('winner'))
+            else:
+                yield [tuple(int(value) for value in move.split(',')[:2]) for move in line.split()], None
+
+
+def self_play(games: int, board_size: int, plies: int, time_limit: float, random_plies: int = 2, seed: int = 0):
+    """Yields (moves, None) for the first plies of games the bot plays against itself
+
+    The first move is the centre, and the next random_plies moves are drawn from the empty points next
+    to the stones, so the games open differently.
+    """
+    from bot import Bot
+    rng = random.Random(seed)
+    bot = Bot(time_limit=time_limit)
+    for _ in range(games):
+        bot.new_game()
+        board = Board(board_size)
+        board.place(board_size // 2, board_size // 2)
+        while len(board.moves) < plies:
+            if len(board.moves) <= random_plies:
+                near = [(x + dx, y + dy) for cell in board.moves for y, x in [divmod(cell, board_size)]
+                        for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+                near = sorted({(x, y) for x, y in near if board.in_bounds(x, y) and board.board[y][x] == Stone.EMPTY})
+                x, y = rng.choice(near)
+            else:
+                _, candidate = bot.choose_move(board)
+                if candidate is None:
+                    break
+                x, y = candidate.point.x, candidate.point.y
+            board.place(x, y)
+            if board.check_win(x, y, board.last_player()):
+                break
+        yield [divmod(cell, board_size)[::-1] for cell in board.moves], None
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Builds an opening book from game records or self-play')
+    parser.add_argument('records', nargs='*', help='files of games, one per line as JSON or as x,y moves')
+    parser.add_argument('--output', required=True, help='path of the book to write')
+    parser.add_argument('--size', type=int, default=15, help='board size of the games')
+    parser.add_argument('--plies', type=int, default=BOOK_PLIES, help='plies of every game read into the book')
+    parser.add_argument('--max-moves', type=int, default=BOOK_MOVES, help='moves kept per position')
+    parser.add_argument('--min-weight', type=int, default=1, help='lightest move kept')
+    parser.add_argument('--self-play', type=int, default=0, help='games the bot plays against itself')
+    parser.add_argument('--time-limit', type=float, default=0.5, help='seconds per self-play move')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the self-play openings')
+    args = parser.parse_args(argv)
+
+    builder = BookBuilder(args.size, args.plies)
+    for path in args.records:
+        for moves, winner in read_records(path):
+            builder.add_game(moves, winner)
+    if args.self_play:
+        for moves, winner in self_play(args.self_play, args.size, args.plies, args.time_limit, seed=args.seed):
+            builder.add_game(moves, winner)
+
+    entries = builder.write(args.output, args.max_moves, args.min_weight)
+    print(f'{builder.games} games, {len(builder.positions)} positions, {entries} entries written to {args.output}',
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+from stones import Stone
+
+# Stones are written as 1 for the player being scored, -1 for the opponent and 0 for an empty point
+PATTERN_SCORE: dict[tuple[int, ...], int] = {
+
+    (1, 1, 1, 1, 1): 1000000,
+
+
+    (0, 1, 1, 1, 1, 0): 100000,
+
+
+    (1, 1, 1, 1, 0): 10000,
+    (0, 1, 1, 1, 1): 10000,
+    (1, 1, 1, 0, 1): 10000,
+    (1, 1, 0, 1, 1): 10000,
+    (1, 0, 1, 1, 1): 10000,
+    (0, 1, 1, 1, -1): 10000,
+    (-1, 1, 1, 1, 0): 10000,
+
+
+    (0, 1, 1, 1, 0): 5000,
+    (0, 1, 0, 1, 1, 0): 5000,
+
+
+    (1, 1, 1, 0): 1000,
+    (0, 1, 1, 1): 1000,
+    (1, 1, 0, 1, 0): 1000,
+    (0, 1, 0, 1, 1): 1000,
+    (0, 1, 1, 0, 1): 1000,
+
+
+    (0, 1, 1, 0): 500,
+    (0, 1, 0, 1, 0): 500,
+
+    (1, 1, 0): 100,
+    (0, 1, 1): 100,
+    (1, 0, 1): 100,
+}
+
+# Every point takes two bits, stone & 3 maps empty, white and black to 0, 1 and 3
+OFF_BOARD = 2
+
+
+def encode_line(line: list[Stone]) -> int:
+    """Encodes a line as an integer holding two bits per point, the first point in the lowest bits"""
+    code = 0
+    for position, stone in enumerate(line):
+        code |= (stone & 3) << (2 * position)
+    return code
+
+
+class PatternTable:
+    """A pattern set compiled into a lookup table indexed by the encoding of a window of points"""
+    def __init__(self, pattern_score: dict[tuple[int, ...], int]):
+        self.pattern_score: dict[tuple[int, ...], int] = pattern_score
+        self.width: int = max(len(pattern) for pattern in pattern_score)
+        self.lengths: list[int] = sorted({len(pattern) for pattern in pattern_score})
+        self.mask: int = (1 << (2 * self.width)) - 1
+        self.padding: int = sum(OFF_BOARD << (2 * i) for i in range(self.width))
+
+        self.white_table: list[int] = self.compile(Stone.WHITE)
+        self.black_table: list[int] = self.compile(Stone.BLACK)
+        self.table: list[int] = [white - black for white, black in zip(self.white_table, self.black_table)]
+
+    def compile(self, player: Stone) -> list[int]:
+        """Scores every possible window for one player, summing the patterns that start at its first point"""
+        table = []
+        for code in range(self.mask + 1):
+            points = [(code >> (2 * i)) & 3 for i in range(self.width)]
+            score = 0
+            for length in self.lengths:
+                if OFF_BOARD in points[:length]:
+                    break
+                window = tuple(0 if point == 0 else 1 if point == (player & 3) else -1 for point in points[:length])
+                score += self.pattern_score.get(window, 0)
+            table.append(score)
+        return table
+
+    def score_code(self, code: int, length: int, table: list[int] = None) -> int:
+        """Scores an encoded line of the given length, white minus black unless another table is given"""
+        if table is None:
+            table = self.table
+        mask = self.mask
+        code |= self.padding << (2 * length)
+        return sum([table[(code >> shift) & mask] for shift in range(0, 2 * length, 2)])
+
+    def score(self, line: list[Stone]) -> int:
+        """Scores a line for white minus black"""
+        return self.score_code(encode_line(line), len(line))
+
+    def score_for(self, line: list[Stone], player: Stone) -> int:
+        """Scores a line for a single player"""
+        table = self.white_table if player == Stone.WHITE else self.black_table
+        return self.score_code(encode_line(line), len(line), table)
+
+
+DEFAULT_PATTERN_TABLE: PatternTable = PatternTable(PATTERN_SCORE)
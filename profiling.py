@@ -0,0 +1,192 @@
+import os
+import sys
+import time
+import signal
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+
+def frame_label(code) -> str:
+    """Names a frame of a collapsed stack after its file, function and first line"""
+    return f'{os.path.basename(code.co_filename)}:{code.co_name}:{code.co_firstlineno}'
+
+
+def collapse(frame) -> str:
+    """Returns the stack ending at a frame as labels joined by semicolons, outermost first"""
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+class Profiler(ABC):
+    """Collects stacks while running and writes them in the collapsed format read by flamegraph tools
+
+    Every line of the output is a stack of frames joined by semicolons followed by a weight.
+    """
+    unit = 'samples'
+
+    def __init__(self):
+        self.stacks: dict[str, int] = {}
+
+    @abstractmethod
+    def start(self):
+        """Starts collecting stacks of the calling thread"""
+
+    @abstractmethod
+    def stop(self):
+        """Stops collecting stacks"""
+
+    def add(self, stack: str, weight: int = 1):
+        self.stacks[stack] = self.stacks.get(stack, 0) + weight
+
+    def write(self, path: str):
+        """Writes the collected stacks to a file, heaviest first"""
+        with open(path, 'w') as file:
+            for stack, weight in sorted(self.stacks.items(), key=lambda item: -item[1]):
+                file.write(f'{stack} {weight}\n')
+
+
+class ThreadSampler(Profiler):
+    """Samples the stack of one thread from a background thread at a fixed interval
+
+    The sampler needs the interpreter lock to read the stack, so in practice samples are at least the
+    switch interval of the interpreter apart (5ms unless changed with sys.setswitchinterval). It works
+    on any thread and platform, and costs the profiled thread nothing but those switches.
+    """
+    def __init__(self, interval: float = 0.001):
+        super().__init__()
+        self.interval: float = interval
+        self.target: int = None
+        self.running: threading.Event = threading.Event()
+        self.thread: threading.Thread = None
+
+    def start(self):
+        self.target = threading.get_ident()
+        self.running.set()
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+        self.thread.start()
+
+    def sample(self):
+        while self.running.is_set():
+            frame = sys._current_frames().get(self.target)
+            if frame is not None:
+                self.add(collapse(frame))
+            del frame
+            time.sleep(self.interval)
+
+    def stop(self):
+        self.running.clear()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+
+class SignalSampler(Profiler):
+    """Samples the stack of the main thread from a profiling timer signal, POSIX only
+
+    The timer counts CPU time of the process, so samples are taken at the interval however the
+    interpreter schedules its threads. Signals are only delivered to the main thread.
+    """
+    def __init__(self, interval: float = 0.001):
+        super().__init__()
+        self.interval: float = interval
+        self.previous_handler = None
+
+    def start(self):
+        if not hasattr(signal, 'setitimer'):
+            raise RuntimeError('Signal sampling needs signal.setitimer, use the thread sampler instead')
+        if threading.current_thread() is not threading.main_thread():
+            raise RuntimeError('Signal sampling only profiles the main thread')
+        self.previous_handler = signal.signal(signal.SIGPROF, self.handle)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def handle(self, signum, frame):
+        self.add(collapse(frame))
+
+    def stop(self):
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, self.previous_handler or signal.SIG_DFL)
+
+
+class TracingProfiler(Profiler):
+    """Records every call and return of the current thread, weighting each stack by the microseconds spent in it
+
+    The result is exact but every call pays for the hook, which inflates the cost of small functions
+    much more than that of large ones. Use it for call counts and structure, and a sampler for timings.
+    """
+    unit = 'microseconds'
+
+    def __init__(self):
+        super().__init__()
+        self.stack: list[str] = []
+        self.last: int = 0
+
+    def start(self):
+        frame = sys._getframe(1)
+        self.stack = [collapse(frame)]
+        self.last = time.perf_counter_ns()
+        sys.setprofile(self.trace)
+
+    def trace(self, frame, event, arg):
+        now = time.perf_counter_ns()
+        if self.stack:
+            self.add(self.stack[-1], (now - self.last) // 1000)
+
+        if event == 'call':
+            self.stack.append(f'{self.stack[-1]};{frame_label(frame.f_code)}' if self.stack else collapse(frame))
+        elif event == 'c_call':
+            self.stack.append(f'{self.stack[-1]};{getattr(arg, "__qualname__", "builtin")}' if self.stack else 'builtin')
+        elif event in ('return', 'c_return', 'c_exception') and len(self.stack) > 1:
+            self.stack.pop()
+        self.last = time.perf_counter_ns()
+
+    def stop(self):
+        sys.setprofile(None)
+        self.stacks = {stack: weight for stack, weight in self.stacks.items() if weight > 0}
+
+
+PROFILERS = {
+    'sampling': ThreadSampler,
+    'signal': SignalSampler,
+    'deterministic': TracingProfiler,
+}
+
+
+class SearchProfiler:
+    """Profiles searches one at a time, writing a collapsed stack file for every search into a directory
+
+    Searches are only profiled when given a SearchProfiler, so production games pay nothing for it.
+    """
+    def __init__(self, mode: str = 'sampling', directory: str = 'profiles', interval: float = 0.001):
+        if mode not in PROFILERS:
+            raise ValueError(f'Unknown profiling mode {mode}, expected one of {", ".join(PROFILERS)}')
+        self.mode: str = mode
+        self.directory: str = directory
+        self.interval: float = interval
+        self.count: int = 0
+        self.last_path: str = None
+
+        # Files of different profilers writing to the same directory are told apart by when the profiler was made
+        self.session: str = time.strftime('%Y%m%d-%H%M%S')
+
+    def create(self) -> Profiler:
+        if self.mode == 'deterministic':
+            return TracingProfiler()
+        return PROFILERS[self.mode](self.interval)
+
+    @contextmanager
+    def profile(self, name: str = 'search'):
+        """Profiles the block and writes its stacks to <directory>/<name>-<session>-<count>.collapsed"""
+        profiler = self.create()
+        profiler.start()
+        try:
+            yield profiler
+        finally:
+            profiler.stop()
+            self.count += 1
+            os.makedirs(self.directory, exist_ok=True)
+            self.last_path = os.path.join(self.directory, f'{name}-{self.session}-{self.count:04d}.collapsed')
+            profiler.write(self.last_path)
@@ -0,0 +1,331 @@
+import os
+import sys
+import time
+import json
+import uuid
+import asyncio
+import argparse
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+# Boards a worker keeps between requests, least recently used first
+WORKER_BOARDS = 64
+
+# Extra seconds a search may run past its deadline before the server stops it
+DEADLINE_GRACE = 0.5
+
+# State of a worker process, kept warm between requests
+worker_bot = None
+worker_boards: OrderedDict = None
+worker_stop_flags = None
+
+
+def initialize_worker(stop_flags, book_path: str = None):
+    """Runs once in every worker process, importing the engine and building its bot ahead of the first request
+
+    Every worker maps the opening book on its own, and the pages of the file are shared between them.
+    """
+    global worker_bot, worker_boards, worker_stop_flags
+    from bot import Bot
+    from opening_book import OpeningBook
+    worker_bot = Bot(book=OpeningBook(book_path) if book_path else None)
+    worker_boards = OrderedDict()
+    worker_stop_flags = stop_flags
+
+
+def warm_up() -> int:
+    """Does nothing, submitted once per worker so that the pool starts every process before the first search"""
+    return os.getpid()
+
+
+def get_worker_board(session_id: str, board_size: int, moves: tuple[tuple[int, int], ...]):
+    """Returns the board of a session at the given position, only placing or cancelling the moves that changed"""
+    from board import Board
+    board = worker_boards.pop(session_id, None)
+    if board is None or board.board_size != board_size:
+        board = Board(board_size)
+
+    cells = [y * board_size + x for x, y in moves]
+    common = 0
+    while common < min(len(cells), len(board.moves)) and board.moves[common] == cells[common]:
+        common += 1
+    while len(board.moves) > common:
+        board.cancel()
+    for x, y in moves[common:]:
+        board.place(x, y)
+
+    worker_boards[session_id] = board
+    while len(worker_boards) > WORKER_BOARDS:
+        worker_boards.popitem(last=False)
+    return board
+
+
+def search_session(session_id: str, board_size: int, moves: tuple[tuple[int, int], ...],
+                   time_limit: float, slot: int) -> dict:
+    """Searches the position of a session in a worker, stopping early once the stop flag of its slot is set"""
+    start = time.perf_counter()
+    board = get_worker_board(session_id, board_size, moves)
+    stop_requested = lambda: worker_stop_flags[slot] != 0
+
+    worker_bot.threat_search.stop_requested = stop_requested
+    worker_bot.minimax.stop_requested = stop_requested
+    worker_bot.time_limit = time_limit
+    book_moves = worker_bot.book_moves
+
+    # The book and the threat search answer without minimax, which then reports no depth and no nodes
+    worker_bot.minimax.completed_depth = 0
+    worker_bot.minimax.nodes = 0
+    try:
+        score, move = worker_bot.choose_move(board)
+    finally:
+        worker_bot.threat_search.stop_requested = None
+        worker_bot.minimax.stop_requested = None
+
+    result = {
+        'score': score,
+        'depth': worker_bot.minimax.completed_depth,
+        'nodes': worker_bot.minimax.nodes,
+        'elapsed': time.perf_counter() - start,
+        'stopped': stop_requested(),
+        'book': worker_bot.book_moves > book_moves,
+    }
+    if move is not None:
+        result['x'], result['y'] = move.point.x, move.point.y
+    return result
+
+
+class RequestError(Exception):
+    pass
+
+
+class Session:
+    """A game hosted by the server, kept as its moves so any worker can rebuild it"""
+    def __init__(self, session_id: str, board_size: int):
+        self.session_id: str = session_id
+        self.board_size: int = board_size
+        self.moves: list[tuple[int, int]] = []
+        self.occupied: set[tuple[int, int]] = set()
+        self.search: asyncio.Future = None
+        self.slot: int = None
+        self.cancelled: bool = False
+
+
+class EngineServer:
+    """An asyncio server hosting many games at once, reading and writing one JSON object per line
+
+    Every request has an "op" and may carry an "id" which is copied into its answer. Searches run on a
+    pool of worker processes started with the server and kept warm between requests. At most
+    max_pending searches run or wait at once, and further searches are refused as busy until one
+    finishes. A search stops at its deadline or when cancelled through a flag shared with the workers.
+    """
+    def __init__(self, workers: int = None, max_pending: int = None, book_path: str = None):
+        self.workers: int = workers or os.cpu_count() or 1
+        self.book_path: str = book_path
+        self.max_pending: int = max_pending or 4 * self.workers
+        self.stop_flags = multiprocessing.Array('b', self.max_pending)
+        self.free_slots: list[int] = list(range(self.max_pending))
+        self.sessions: dict[str, Session] = {}
+        self.executor: ProcessPoolExecutor = None
+        self.searches: int = 0
+
+        self.operations = {
+            'new_game': self.new_game,
+            'play': self.play,
+            'undo': self.undo,
+            'search': self.search,
+            'cancel': self.cancel,
+            'close': self.close_session,
+            'stats': self.stats,
+        }
+
+    async def start_pool(self):
+        """Starts every worker process and waits until each has imported the engine"""
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=initialize_worker,
+                                            initargs=(self.stop_flags, self.book_path))
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, warm_up) for _ in range(self.workers)))
+
+    def shutdown(self):
+        if self.executor is not None:
+            for slot in range(self.max_pending):
+                self.stop_flags[slot] = 1
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Answers the requests of one client, several of which may be in flight at once"""
+        write_lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                task = asyncio.create_task(self.answer(line, writer, write_lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    async def answer(self, line: bytes, writer: asyncio.StreamWriter, write_lock: asyncio.Lock):
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise RequestError('a request must be a JSON object')
+            request_id = request.get('id')
+            operation = self.operations.get(request.get('op'))
+            if operation is None:
+                raise RequestError(f'unknown op {request.get("op")!r}')
+            response = {'ok': True, **await operation(request)}
+        except (RequestError, ValueError, TypeError, KeyError) as error:
+            response = {'ok': False, 'error': str(error)}
+
+        if request_id is not None:
+            response['id'] = request_id
+        async with write_lock:
+            writer.write((json.dumps(response) + '\n').encode())
+            await writer.drain()
+
+    def get_session(self, request: dict) -> Session:
+        session = self.sessions.get(request.get('session'))
+        if session is None:
+            raise RequestError(f'unknown session {request.get("session")!r}')
+        return session
+
+    async def new_game(self, request: dict) -> dict:
+        board_size = int(request.get('size', 15))
+        if not 5 <= board_size <= 32:
+            raise RequestError(f'unsupported board size {board_size}')
+        session_id = uuid.uuid4().hex
+        self.sessions[session_id] = Session(session_id, board_size)
+        return {'session': session_id}
+
+    def place(self, session: Session, x: int, y: int):
+        if session.search is not None:
+            raise RequestError('the session is searching')
+        if not (0 <= x < session.board_size and 0 <= y < session.board_size):
+            raise RequestError(f'point {x},{y} is off the board')
+        if (x, y) in session.occupied:
+            raise RequestError(f'point {x},{y} is not empty')
+        session.moves.append((x, y))
+        session.occupied.add((x, y))
+
+    async def play(self, request: dict) -> dict:
+        session = self.get_session(request)
+        self.place(session, int(request['x']), int(request['y']))
+        return {'moves': len(session.moves)}
+
+    async def undo(self, request: dict) -> dict:
+        session = self.get_session(request)
+        if session.search is not None:
+            raise RequestError('the session is searching')
+        if not session.moves:
+            raise RequestError('there is no move to undo')
+        session.occupied.discard(session.moves.pop())
+        return {'moves': len(session.moves)}
+
+    async def search(self, request: dict) -> dict:
+        """Searches the position of a session for at most time_limit seconds, playing the move found when play is set"""
+        session = self.get_session(request)
+        time_limit = float(request.get('time_limit', 1.0))
+        if time_limit <= 0:
+            raise RequestError('time_limit must be positive')
+        if session.search is not None:
+            raise RequestError('the session is already searching')
+        if not self.free_slots:
+            raise RequestError('busy')
+
+        slot = self.free_slots.pop()
+        self.stop_flags[slot] = 0
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, search_session, session.session_id, session.board_size,
+                                      tuple(session.moves), time_limit, slot)
+
+        # The slot stays taken until the worker is done with it, even when the request is cancelled
+        # first, so that a new search never clears the stop flag of one still running
+        future.add_done_callback(lambda _: self.free_slots.append(slot))
+        session.search, session.slot, session.cancelled = future, slot, False
+        self.searches += 1
+        try:
+            try:
+                result = await asyncio.wait_for(asyncio.shield(future), time_limit + DEADLINE_GRACE)
+            except asyncio.TimeoutError:
+                self.stop_flags[slot] = 1
+                result = await future
+        except asyncio.CancelledError:
+            self.stop_flags[slot] = 1
+            raise
+        finally:
+            session.search, session.slot = None, None
+
+        result['cancelled'] = session.cancelled
+        if request.get('play') and 'x' in result and not session.cancelled:
+            self.place(session, result['x'], result['y'])
+        return result
+
+    async def cancel(self, request: dict) -> dict:
+        session = self.get_session(request)
+        if session.search is None:
+            return {'cancelled': False}
+        session.cancelled = True
+        self.stop_flags[session.slot] = 1
+        return {'cancelled': True}
+
+    async def close_session(self, request: dict) -> dict:
+        session = self.get_session(request)
+        if session.search is not None:
+            session.cancelled = True
+            self.stop_flags[session.slot] = 1
+        del self.sessions[request['session']]
+        return {}
+
+    async def stats(self, request: dict) -> dict:
+        return {
+            'sessions': len(self.sessions),
+            'workers': self.workers,
+            'pending': self.max_pending - len(self.free_slots),
+            'max_pending': self.max_pending,
+            'searches': self.searches,
+        }
+
+
+async def serve(host: str = '127.0.0.1', port: int = 8765, unix_socket: str = None,
+                workers: int = None, max_pending: int = None, book_path: str = None):
+    engine_server = EngineServer(workers, max_pending, book_path)
+    await engine_server.start_pool()
+    if unix_socket is not None:
+        server = await asyncio.start_unix_server(engine_server.handle_connection, path=unix_socket)
+    else:
+        server = await asyncio.start_server(engine_server.handle_connection, host, port)
+    addresses = ', '.join(str(socket.getsockname()) for socket in server.sockets)
+    print(f'Serving on {addresses} with {engine_server.workers} workers', file=sys.stderr, flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        engine_server.shutdown()
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description='Hosts many games over JSON lines with a pool of search processes')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help='path of a UNIX socket to listen on instead of TCP')
+    parser.add_argument('--workers', type=int, help='search processes, the number of cores by default')
+    parser.add_argument('--max-pending', type=int, help='searches running or waiting at once before new ones are refused')
+    parser.add_argument('--book', help='opening book the workers play from before searching')
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.unix, args.workers, args.max_pending, args.book))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
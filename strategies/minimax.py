@@ -1,132 +1,577 @@
-from utilities import Candidate, Frame, Move
+import time
+from typing import Callable
+from contextlib import nullcontext
+from utilities import Candidate, Frame
 from stones import Stone
 from board import Board
+from instrumentation import SearchStatistics
+from profiling import SearchProfiler
+from strategies.transposition import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND, NO_MOVE
+from strategies.threat_search import ThreatSearch
+from strategies.threat_map import ThreatMap, MAX_CANDIDATES
+
+
+# Half width of the first aspiration window around the score of the previous iteration, widened by the factor on a failure
+ASPIRATION_WINDOW = 1000
+ASPIRATION_GROWTH = 8
+ASPIRATION_LIMIT = 1 << 20
+
+# Every line holding four stones of a player in a window of five scores at least a four for that player alone,
+# while its net score may be far lower when the opponent has patterns on it too
+FOUR_SCORE = 10000
+
+# Candidates of a node searched to full depth before the others are reduced by a ply, and the plies a line may need left to be reduced
+LATE_MOVE_INDEX = 4
+LATE_MOVE_MIN_REMAINING = 2
+
+# Margin by which the static score of a node above the leaves has to miss the window before its quiet candidates are pruned
+FUTILITY_MARGIN = 5000
+
+# Plies a line may be extended by past the depth of the search, and the score of a line near a point for either player above which it is not quiet
+MAX_EXTENSION = 1
+THREE_SCORE = 5000
+
+# Nodes and plies the quiescence search may spend below a single leaf
+QUIESCENCE_NODES = 64
+QUIESCENCE_DEPTH = 8
+
+# Deepest iteration a search deepens to when no other budget stops it
+MAX_SEARCH_DEPTH = 32
+
+
+class SearchInterrupted(Exception):
+    pass
 
 
 class Minimax:
-    """Class that contains the minimax strategy"""
-    def __init__(self):
+    """Class that contains the minimax strategy
+
+    Inside the search every move is a point encoded as y * board_size + x. Only the move returned by run
+    is turned into a Candidate.
+
+    With principal_variation_search the first candidate of a node is searched with the window of the node
+    and every other candidate with a null window, which only tells whether it beats the best score so far.
+    The few that do are searched again with the full window. With an aspiration window every iteration of
+    search starts from a window around the score of the previous one, widening it when the score falls outside.
+
+    With quiescence a leaf where a player can complete five next to the last two moves is not scored statically. The search
+    carries on along forcing moves only, completing five, blocking the five of the opponent or making a
+    four, until the position is quiet or the quiescence budget of the leaf is spent.
+
+    Three selective options change how deep each candidate is searched. Late move reductions search
+    quiet candidates far down the list a ply shallower and search them again at full depth if they beat
+    the best score. Futility pruning skips quiet candidates of a node just above the leaves when its static
+    score is too far outside the window. Threat extensions search a ply deeper after a move making or
+    blocking a four.
+    """
+    def __init__(self, transposition_table_size: int = 1 << 18, collect_statistics: bool = False,
+                 profiler: SearchProfiler = None, principal_variation_search: bool = False,
+                 aspiration_window: int = ASPIRATION_WINDOW, quiescence: bool = True,
+                 quiescence_nodes: int = QUIESCENCE_NODES, late_move_reductions: bool = False,
+                 futility_pruning: bool = False, threat_extensions: bool = False, threat_candidates: bool = True,
+                 max_candidates: int = MAX_CANDIDATES):
+        self.killer_moves: dict[int, list[int]] = {}
+
+        # Score of every point for each player, raised whenever the point caused a cutoff and halved before every search
+        self.history: dict[Stone, dict[int, int]] = {Stone.WHITE: {}, Stone.BLACK: {}}
+        self.transposition_table: TranspositionTable = TranspositionTable(transposition_table_size)
+        self.principal_variation: list[int] = []
+        self.completed_depth: int = 0
+
+        self.nodes: int = 0
+        self.budget_active: bool = False
+        self.deadline: float = None
+        self.node_limit: int = None
+
+        # Called with the budget checks, a search stops like when out of time once it returns true
+        self.stop_requested: Callable[[], bool] = None
+
+        # Statistics of the last search, only kept when collect_statistics is set
+        self.collect_statistics: bool = collect_statistics
+        self.statistics: SearchStatistics = None
+
+        # Every search is profiled into its own file when a profiler is given
+        self.profiler: SearchProfiler = profiler
+
+        self.principal_variation_search: bool = principal_variation_search
+        self.aspiration_window: int = aspiration_window
+
+        self.quiescence: bool = quiescence
+        self.quiescence_nodes: int = quiescence_nodes
+        self.quiescence_budget: int = 0
+
+        self.late_move_reductions: bool = late_move_reductions
+        self.futility_pruning: bool = futility_pruning
+        self.threat_extensions: bool = threat_extensions
+
+        # Candidates come from the threats of every point, or else from every point within distance 2 of a stone
+        self.threat_candidates: bool = threat_candidates
+        self.threat_map: ThreatMap = ThreatMap(max_candidates)
+
+        # Only used for its helpers finding the points where a player completes five or makes a four
+        self.threats: ThreatSearch = ThreatSearch()
+
+    def new_game(self):
+        """Forgets the killer moves, history and search results of the previous game"""
         self.killer_moves = {}
+        self.history = {Stone.WHITE: {}, Stone.BLACK: {}}
+        self.transposition_table.clear()
+
+    def search(self, board: Board, time_limit: float = None, node_limit: int = None, max_depth: int = MAX_SEARCH_DEPTH,
+               statistics: SearchStatistics = None, resume: tuple[int, tuple[int, Candidate]] = None) -> tuple[int, Candidate]:
+        """Deepens the search one ply at a time until the time or node budget runs out, returns the result of the deepest completed depth
+
+        The search records into the statistics given, or into new ones when collect_statistics is set. Resume
+        is the completed depth and result of an earlier search of the same position by this Minimax, such as
+        a pondering search, which is carried on from the next depth with its principal variation.
+        """
+        self.deadline = None if time_limit is None else time.perf_counter() + time_limit
+        self.node_limit = node_limit
+        self.nodes = 0
+        if resume is None:
+            self.age_tables()
+            self.principal_variation = []
+            self.completed_depth = 0
+            result = None
+        else:
+            self.completed_depth, result = resume
+        if statistics is None and self.collect_statistics:
+            statistics = SearchStatistics()
+        self.statistics = statistics
+
+        scores: dict[int, int] = {}
+        profile = self.profiler.profile('minimax') if self.profiler is not None else nullcontext()
+        with profile:
+            try:
+                for depth in range(self.completed_depth + 1, max_depth + 1):
+                    # The first depth always completes so that there is a move to return
+                    self.budget_active = result is not None
+                    nodes_before = self.nodes
+                    start = time.perf_counter()
+                    try:
+                        if self.aspiration_window and result is not None:
+                            # Scores swing between odd and even depths, so the guess comes from two depths back when there is one
+                            guess = scores.get(depth - 2, result[0])
+                            result = self.run_with_aspiration(depth, board, guess)
+                        else:
+                            result = self.run(depth, board)
+                    except SearchInterrupted:
+                        break
 
-    def run(self, max_depth: int, board: Board) -> tuple[int, Move]:
-        """Minimax function that returns a tuple containing the score and the best move"""
-        initial_candidates = self.get_candidate(board, board.current_player, depth=0)
-        call_stack: list[Frame] = [Frame(0, board.current_player, 0, initial_candidates, None)]
+                    self.completed_depth = depth
+                    scores[depth] = result[0]
+                    if self.statistics is not None:
+                        self.statistics.end_iteration(depth, self.nodes - nodes_before, time.perf_counter() - start)
+                    if self.out_of_budget():
+                        break
+            finally:
+                self.budget_active = False
+                self.deadline = None
+                self.node_limit = None
+                if self.statistics is not None:
+                    self.statistics.nodes = self.nodes
+
+        return result
+
+    def run_with_aspiration(self, max_depth: int, board: Board, guess: int) -> tuple[int, Candidate]:
+        """Runs the search inside a window around a guessed score, widening the window until the score falls inside it"""
+        half_width = self.aspiration_window
+        while half_width < ASPIRATION_LIMIT:
+            alpha, beta = guess - half_width, guess + half_width
+            result = self.run(max_depth, board, alpha, beta)
+            if alpha < result[0] < beta:
+                return result
+            if self.statistics is not None:
+                self.statistics.aspiration_failures += 1
+            half_width *= ASPIRATION_GROWTH
+        return self.run(max_depth, board)
+
+    def out_of_budget(self) -> bool:
+        """Returns whether the time or node budget of the current search is spent, or the search was asked to stop"""
+        if self.stop_requested is not None and self.stop_requested():
+            return True
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            return True
+        return self.deadline is not None and time.perf_counter() >= self.deadline
+
+    def interrupt(self, board: Board, root_moves: int):
+        """Takes back every move placed by an unfinished search and stops it"""
+        while len(board.moves) > root_moves:
+            board.cancel()
+        raise SearchInterrupted()
+
+    def run(self, max_depth: int, board: Board, alpha: int = None, beta: int = None) -> tuple[int, Candidate]:
+        """Minimax function that returns a tuple containing the score and the best move, optionally searching only inside (alpha, beta)"""
+        if max_depth < 1:
+            raise Exception('Please set your the max depth to be greater than or equal to 1')
+
+        root_entry = self.transposition_table.probe(board.hash_for_board)
+        root_move = root_entry[3] if root_entry is not None else NO_MOVE
+        principal_variation = self.principal_variation
+        initial_candidates = self.get_candidate(board, board.current_player, depth=0, tt_move=root_move,
+                                                pv_move=principal_variation[0] if principal_variation else None)
+        call_stack: list[Frame] = [Frame(0, board.current_player, 0, initial_candidates, None, alpha, beta,
+                                         key=board.hash_for_board, on_principal_variation=True, horizon=max_depth)]
+        root_moves = len(board.moves)
+        statistics = self.statistics
         while call_stack:
             current_frame = call_stack[-1]
 
             if current_frame.candidate_index > 0:
                 board.cancel()
+                if self.futility_pruning and current_frame.depth + 1 == current_frame.horizon:
+                    self.skip_futile_candidates(board, current_frame)
 
-            if current_frame.depth == max_depth:
-                if self.handle_max_depth_frame(board, current_frame, call_stack):
-                    raise Exception('Please set your the max depth to be greater than or equal to 1')
-                
-                current_frame = call_stack[-1]
-                if current_frame.beta <= current_frame.alpha:
-                    self.add_killer_move(current_frame.depth, current_frame.candidates[current_frame.candidate_index - 1])
-                    current_frame.candidate_index = len(current_frame.candidates)
-
+            if current_frame.candidate_index >= len(current_frame.candidates):
+                if self.handle_terminal_frame(board, current_frame, call_stack):
+                    self.principal_variation = current_frame.principal_variation
+                    return (current_frame.best_score, self.to_candidate(board, current_frame.best_candidate, current_frame.player))
                 continue
 
-            if current_frame.candidate_index >= len(current_frame.candidates):
-                if self.handle_terminal_frame(current_frame, call_stack):
-                    return (current_frame.best_score, current_frame.best_candidate)
-                
-                current_frame = call_stack[-1]
-                if current_frame.beta <= current_frame.alpha:
-                    self.add_killer_move(current_frame.depth, current_frame.candidates[current_frame.candidate_index - 1])
+            candidate = self.place_next_candidate(board, current_frame)
+            if statistics is not None:
+                statistics.nodes_per_depth[current_frame.depth + 1] += 1
+
+            if self.budget_active and self.nodes & 63 == 0 and self.out_of_budget():
+                self.interrupt(board, root_moves)
+
+            horizon, reduction = current_frame.horizon, 0
+            if self.threat_extensions or self.late_move_reductions:
+                forcing = self.is_forcing(board, candidate, current_frame.player)
+                # A four made or blocked by a leaf is already followed up by the quiescence search
+                if (self.threat_extensions and forcing and horizon < max_depth + MAX_EXTENSION
+                        and current_frame.depth + 1 < horizon):
+                    horizon += 1
+                elif (self.late_move_reductions and not forcing and current_frame.candidate_index > LATE_MOVE_INDEX
+                      and horizon - current_frame.depth - 1 >= LATE_MOVE_MIN_REMAINING):
+                    horizon, reduction = horizon - 1, 1
 
+            # The game ends with five in a row, so a move completing five is scored like a leaf
+            if current_frame.depth + 1 >= horizon or self.is_won(board, candidate):
+                if statistics is not None:
+                    statistics.leaves += 1
+                self.handle_max_depth_frame(board, current_frame, candidate)
                 continue
 
-            candidate = self.place_next_candidate(board, current_frame)
+            entry = self.transposition_table.probe(board.hash_for_board)
+            tt_move = NO_MOVE
+            if statistics is not None:
+                statistics.tt_probes += 1
+            if entry is not None:
+                tt_move = entry[3]
+                if statistics is not None:
+                    statistics.tt_hits += 1
+                if self.is_transposition_cutoff(entry, horizon - current_frame.depth - 1, current_frame):
+                    if statistics is not None:
+                        statistics.tt_cutoffs += 1
+                    self.update_parent_frame(current_frame, entry[2], candidate)
+                    continue
 
             next_player = Stone(current_frame.player * -1)
 
-            next_candidates = self.get_candidate(board, next_player, current_frame.depth + 1)
+            next_depth = current_frame.depth + 1
+            on_principal_variation = (current_frame.on_principal_variation
+                                      and len(principal_variation) > next_depth
+                                      and principal_variation[current_frame.depth] == candidate)
+            pv_move = principal_variation[next_depth] if on_principal_variation else None
+
+            next_candidates = self.get_candidate(board, next_player, next_depth, tt_move, pv_move)
+            if statistics is not None:
+                statistics.count_branching(len(next_candidates))
+
+            alpha, beta = current_frame.alpha, current_frame.beta
+            if self.principal_variation_search and current_frame.candidate_index > 1 and beta - alpha > 1:
+                # Only ask whether this candidate beats the best so far, handle_terminal_frame searches it again if so
+                if current_frame.player == Stone.WHITE and alpha != float('-inf'):
+                    beta = alpha + 1
+                elif current_frame.player == Stone.BLACK and beta != float('inf'):
+                    alpha = beta - 1
 
             next_frame = Frame(
                 depth=current_frame.depth + 1,
                 player=next_player,
                 candidate_index=0,
                 candidates=next_candidates,
-                current_candidate= Candidate(candidate.point.x, candidate.point.y, candidate.player),
-                alpha = current_frame.alpha,
-                beta = current_frame.beta
+                current_candidate=candidate,
+                alpha = alpha,
+                beta = beta,
+                key = board.hash_for_board,
+                on_principal_variation = on_principal_variation,
+                horizon = horizon,
+                reduction = reduction
             )
             self.add_new_frame(next_frame, call_stack)
 
-    def handle_terminal_frame(self, frame: Frame, call_stack: list[Frame]) -> bool:
+    def is_transposition_cutoff(self, entry: tuple[int, int, int, int], remaining_depth: int, parent_frame: Frame) -> bool:
+        """Returns whether a stored result is deep enough and tight enough to stand in for searching the position"""
+        depth, flag, score, _ = entry
+        if depth < remaining_depth:
+            return False
+        if flag == EXACT:
+            return True
+        if flag == LOWER_BOUND:
+            return score >= parent_frame.beta
+        return score <= parent_frame.alpha
+
+    def store_frame(self, board: Board, frame: Frame):
+        """Stores the result of a fully searched frame in the transposition table"""
+        score = frame.best_score
+        if score in (float('inf'), float('-inf')):
+            return
+
+        if score <= frame.alpha_original:
+            flag = UPPER_BOUND
+        elif score >= frame.beta_original:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+
+        move = frame.best_candidate if frame.best_candidate is not None else NO_MOVE
+        self.transposition_table.store(frame.key, frame.horizon - frame.depth, flag, score, move)
+
+    def handle_terminal_frame(self, board: Board, frame: Frame, call_stack: list[Frame]) -> bool:
         """Handles the case when we traversed all candidates of a frame, returns true if there exists no more frames and we are done"""
-        if frame.candidate_index >= len(frame.candidates):
-            best_score = frame.best_score
+        if not frame.candidates:
+            frame.best_score = board.evaluate_board()
 
-            call_stack.pop()
+        self.store_frame(board, frame)
 
-            if not call_stack:
-                return True
-            
-            parent_frame = call_stack[-1]
+        call_stack.pop()
 
-            if parent_frame.player == Stone.WHITE:
-                if best_score > parent_frame.best_score:
-                    parent_frame.best_score = best_score
-                    parent_frame.best_candidate = Candidate(frame.current_candidate.point.x, frame.current_candidate.point.y, frame.current_candidate.player)
-                
-                if best_score > parent_frame.alpha:
-                    parent_frame.alpha = best_score
-                    
-
-
-            if parent_frame.player == Stone.BLACK:
-                if best_score < parent_frame.best_score:
-                    parent_frame.best_score = best_score
-                    parent_frame.best_candidate = Candidate(frame.current_candidate.point.x, frame.current_candidate.point.y, frame.current_candidate.player)
-                
-                if best_score < parent_frame.beta:
-                    parent_frame.beta = best_score
-                    
+        if not call_stack:
+            return True
 
+        if self.needs_research(frame, call_stack[-1]):
+            call_stack.append(self.research_frame(frame, call_stack[-1]))
             return False
-        
-    def handle_max_depth_frame(self, board: Board, frame: Frame, call_stack: list[Frame]) -> bool:
-        """Handles the case when we reached maximum recursion depth, returns true if there are no more frames and we are done"""
+
+        self.update_parent_frame(call_stack[-1], frame.best_score, frame.current_candidate, frame.principal_variation)
+        return False
+
+    def needs_research(self, frame: Frame, parent_frame: Frame) -> bool:
+        """Returns whether a frame was reduced or searched with a null window inside a wider one, and beat the best score of its parent"""
+        if frame.reduction:
+            if parent_frame.player == Stone.WHITE:
+                return frame.best_score > parent_frame.alpha
+            return frame.best_score < parent_frame.beta
+        if frame.beta_original - frame.alpha_original > 1 or parent_frame.beta - parent_frame.alpha <= 1:
+            return False
+        return parent_frame.alpha < frame.best_score < parent_frame.beta
+
+    def research_frame(self, frame: Frame, parent_frame: Frame) -> Frame:
+        """Returns a frame searching the position of a frame again, to full depth if it was reduced and otherwise with the full window of its parent
+
+        The candidate of the frame is still on the board, so the new frame starts where the old one did. A
+        reduced frame keeps its window, so it may be searched a third time if that was a null window.
+        """
+        if self.statistics is not None:
+            self.statistics.researches += 1
+        if frame.reduction:
+            return Frame(frame.depth, frame.player, 0, frame.candidates, frame.current_candidate,
+                         frame.alpha_original, frame.beta_original, key=frame.key,
+                         on_principal_variation=frame.on_principal_variation, horizon=frame.horizon + frame.reduction)
+        return Frame(frame.depth, frame.player, 0, frame.candidates, frame.current_candidate,
+                     parent_frame.alpha, parent_frame.beta, key=frame.key,
+                     on_principal_variation=frame.on_principal_variation, horizon=frame.horizon)
+
+    def handle_max_depth_frame(self, board: Board, frame: Frame, candidate: int):
+        """Handles the case when the candidate just placed reaches maximum recursion depth by scoring it statically, or by quiescence when it is not quiet"""
+        if self.quiescence and not self.is_quiet(board):
+            self.quiescence_budget = self.quiescence_nodes
+            score = self.quiescence_search(board, Stone(-frame.player), frame.alpha, frame.beta, 0)
+        else:
+            score = board.evaluate_board()
+        self.update_parent_frame(frame, score, candidate)
+
+    def is_won(self, board: Board, cell: int) -> bool:
+        """Returns whether the move just made at a point completed five in a row"""
+        y, x = divmod(cell, board.board_size)
+        return board.check_win(x, y, board.board[y][x])
+
+    def is_forcing(self, board: Board, cell: int, player: Stone) -> bool:
+        """Returns whether the move the player just made at a point blocked a five of the opponent or made a four"""
+        y, x = divmod(cell, board.board_size)
+        return self.threats.completes_five(board, x, y, Stone(-player)) or self.makes_four(board, cell, player)
+
+    def makes_four(self, board: Board, cell: int, player: Stone) -> bool:
+        """Returns whether the stone of the player at a point is one of four which five in a row can be completed from"""
+        y, x = divmod(cell, board.board_size)
+        for index, position in board.lines_through[y][x]:
+            if not self.line_holds(board, index, player, 4, FOUR_SCORE):
+                continue
+            start = max(0, position - 5)
+            stones = [board.board[py][px] for px, py in board.lines[index][start:position + 6]]
+            centre = position - start
+            for empty in range(max(0, centre - 4), min(len(stones), centre + 5)):
+                if stones[empty] != Stone.EMPTY:
+                    continue
+                left, right = empty - 1, empty + 1
+                while left >= 0 and stones[left] == player:
+                    left -= 1
+                while right < len(stones) and stones[right] == player:
+                    right += 1
+                if right - left - 1 == 5 and left < centre < right:
+                    return True
+        return False
+
+    def skip_futile_candidates(self, board: Board, frame: Frame):
+        """Moves past the quiet candidates of a node above the leaves while its static score misses the window by the margin"""
         score = board.evaluate_board()
+        if frame.player == Stone.WHITE:
+            futile = score + FUTILITY_MARGIN <= frame.alpha
+        else:
+            futile = score - FUTILITY_MARGIN >= frame.beta
+        if not futile:
+            return
 
-        call_stack.pop()
+        size = board.board_size
+        candidates = frame.candidates
+        while frame.candidate_index < len(candidates):
+            y, x = divmod(candidates[frame.candidate_index], size)
+            if any(self.line_holds(board, index, player, 3, THREE_SCORE)
+                   for index, _ in board.lines_through[y][x] for player in (Stone.WHITE, Stone.BLACK)):
+                return
+            frame.candidate_index += 1
+            if self.statistics is not None:
+                self.statistics.futility_prunes += 1
 
-        if not call_stack:
+    def is_quiet(self, board: Board) -> bool:
+        """Returns whether neither player can complete five next to the last two moves, or the game is already won"""
+        if len(board.moves) < 2:
             return True
-        
-        parent_frame = call_stack[-1]
+        for cell in board.moves[-2:]:
+            if self.is_won(board, cell):
+                return True
+        return not (self.five_points(board, board.current_player, board.moves[-2])
+                    or self.five_points(board, Stone(-board.current_player), board.moves[-1]))
+
+    def five_points(self, board: Board, player: Stone, cell: int) -> list[tuple[int, int]]:
+        """Returns the empty points within four of a move where the player completes five in a row
+
+        Only lines through the move holding a four of the player are looked at.
+        """
+        points = []
+        y, x = divmod(cell, board.board_size)
+        for index, position in board.lines_through[y][x]:
+            if not self.line_holds(board, index, player, 4, FOUR_SCORE):
+                continue
+            line = board.lines[index]
+            for px, py in line[max(0, position - 4):position + 5]:
+                if board.board[py][px] == Stone.EMPTY and (px, py) not in points and self.threats.completes_five(board, px, py, player):
+                    points.append((px, py))
+        return points
 
+    def line_holds(self, board: Board, index: int, player: Stone, stones: int, score: int) -> bool:
+        """Returns whether a line scores at least the score for the player, only scoring it when it has enough of their stones"""
+        return board.stones_on_line(index, player) >= stones and board.line_score_for(index, player) >= score
+
+    def all_five_points(self, board: Board, player: Stone) -> list[tuple[int, int]]:
+        """Returns every empty point where the player completes five in a row"""
+        threats = self.threats
+        return [(x, y) for x, y in threats.candidate_points(board, player) if threats.completes_five(board, x, y, player)]
+
+    def four_points(self, board: Board, player: Stone, cell: int) -> list[tuple[int, int]]:
+        """Returns the empty points within four of a move where the player makes a four"""
+        points = []
+        y, x = divmod(cell, board.board_size)
+        for index, position in board.lines_through[y][x]:
+            for px, py in board.lines[index][max(0, position - 4):position + 5]:
+                if (board.board[py][px] == Stone.EMPTY and (px, py) not in points
+                        and self.threats.find_threat(board, px, py, player, use_threes=False) is not None):
+                    points.append((px, py))
+        return points
+
+    def quiescence_search(self, board: Board, player: Stone, alpha: int, beta: int, ply: int) -> int:
+        """Scores the position with the player to move by searching only forcing moves inside (alpha, beta)
+
+        A player completing five wins, and a player facing a five of the opponent has to block it. Otherwise
+        the player may stand on the static score or make a four. Once the budget of the leaf or the plies
+        run out the position is scored statically. Fours are only looked for next to the last move of the
+        player, where the fours continuing a sequence of forcing moves lie.
+        """
+        self.quiescence_budget -= 1
+        if self.statistics is not None:
+            self.statistics.quiescence_nodes += 1
+
+        wins = self.all_five_points(board, player)
+        if wins:
+            x, y = wins[0]
+            board.place(x, y)
+            score = board.evaluate_board()
+            board.cancel()
+            return score
+
+        opponent = Stone(-player)
+        blocks = self.all_five_points(board, opponent)
+        if blocks:
+            if self.quiescence_budget <= 0 or ply >= QUIESCENCE_DEPTH:
+                return board.evaluate_board()
+            moves = blocks
+            best_score = float('-inf') if player == Stone.WHITE else float('inf')
+        else:
+            best_score = board.evaluate_board()
+            if self.quiescence_budget <= 0 or ply >= QUIESCENCE_DEPTH:
+                return best_score
+            if player == Stone.WHITE:
+                if best_score >= beta:
+                    return best_score
+                alpha = max(alpha, best_score)
+            else:
+                if best_score <= alpha:
+                    return best_score
+                beta = min(beta, best_score)
+            moves = self.four_points(board, player, board.moves[-2])
+
+        for x, y in moves:
+            board.place(x, y)
+            score = self.quiescence_search(board, opponent, alpha, beta, ply + 1)
+            board.cancel()
+            if player == Stone.WHITE:
+                best_score = max(best_score, score)
+                alpha = max(alpha, score)
+            else:
+                best_score = min(best_score, score)
+                beta = min(beta, score)
+            if beta <= alpha:
+                break
+        return best_score
+
+    def update_parent_frame(self, parent_frame: Frame, score: int, candidate: int, principal_variation: list[int] = None):
+        """Passes the score of a searched candidate up to its frame, skipping the remaining candidates on a cutoff"""
         if parent_frame.player == Stone.WHITE:
             if score > parent_frame.best_score:
                 parent_frame.best_score = score
-                parent_frame.best_candidate = Candidate(frame.current_candidate.point.x, frame.current_candidate.point.y, frame.current_candidate.player)
-            
+                parent_frame.best_candidate = candidate
+                parent_frame.principal_variation = [candidate] + (principal_variation or [])
+
             if score > parent_frame.alpha:
                 parent_frame.alpha = score
-                return False
 
         if parent_frame.player == Stone.BLACK:
             if score < parent_frame.best_score:
                 parent_frame.best_score = score
-                parent_frame.best_candidate = Candidate(frame.current_candidate.point.x, frame.current_candidate.point.y, frame.current_candidate.player)
+                parent_frame.best_candidate = candidate
+                parent_frame.principal_variation = [candidate] + (principal_variation or [])
 
             if score < parent_frame.beta:
                 parent_frame.beta = score
-                return False
 
-        return False
-    
-    def place_next_candidate(self, board: Board, frame: Frame) -> Candidate:
+        if parent_frame.beta <= parent_frame.alpha:
+            if self.statistics is not None:
+                self.statistics.cutoffs_per_depth[parent_frame.depth] += 1
+            self.add_killer_move(parent_frame.depth, candidate)
+            self.add_history(parent_frame.player, candidate, parent_frame.horizon - parent_frame.depth)
+            parent_frame.candidate_index = len(parent_frame.candidates)
+
+    def place_next_candidate(self, board: Board, frame: Frame) -> int:
         """Places the current candidate for the current frame on the board, returns the candidate being placed"""
         candidate = frame.candidates[frame.candidate_index]
 
         frame.candidate_index += 1
+        self.nodes += 1
 
-        board.place(candidate.point.x, candidate.point.y)
+        y, x = divmod(candidate, board.board_size)
+        board.place(x, y)
 
         return candidate
 
@@ -135,42 +580,100 @@ class Minimax:
         call_stack.append(frame)
 
 
-    def add_killer_move(self, depth: int, move: Candidate):
+    def age_tables(self):
+        """Drops the killer moves, which belong to the plies of the previous search, and halves the history"""
+        self.killer_moves = {}
+        for history in self.history.values():
+            for cell, score in list(history.items()):
+                if score > 1:
+                    history[cell] = score >> 1
+                else:
+                    del history[cell]
+
+    def add_history(self, player: Stone, move: int, remaining_depth: int):
+        """Raises the history of a move which caused a cutoff, more so the more plies were left below it"""
+        history = self.history[player]
+        history[move] = history.get(move, 0) + remaining_depth * remaining_depth
+
+    def add_killer_move(self, depth: int, move: int):
         """Adds a killer move for the given depth"""
         if depth not in self.killer_moves:
             self.killer_moves[depth] = []
-        
+
         if move not in self.killer_moves[depth]:
             if len(self.killer_moves[depth]) >= 3:
                 self.killer_moves[depth].pop()
-            
+
             self.killer_moves[depth].insert(0, move)
-    
-    def get_candidate(self, board: Board, player: Stone, depth: int):
-        """Returns a deepcopy of the candidates of the player entered, with killer moves prioritized"""
+
+    def to_candidate(self, board: Board, move: int, player: Stone) -> Candidate:
+        """Turns a point of the search into a Candidate of the player, None stays None"""
+        if move is None:
+            return None
+        return Candidate(move % board.board_size, move // board.board_size, player)
+
+    def get_candidate(self, board: Board, player: Stone, depth: int, tt_move: int = NO_MOVE, pv_move: int = None) -> list[int]:
+        """Returns a copy of the candidate points of the player entered, best first
+
+        The principal variation move comes first, then the transposition table move, the points completing
+        five for the player and then those blocking five of the opponent, the killer moves of the depth, and
+        every other point by its history and then by a local score. With threat candidates the points and the
+        local score come from the threat map, which already puts wins and blocks first. Otherwise they come
+        from the points near the stones of one player and the number of stones within distance 2 of them.
+        """
+        if self.threat_candidates:
+            candidates, ranks = self.threat_map.generate(board, player)
+            history = self.history[player]
+            candidates.sort(key=lambda cell: (history.get(cell, 0), ranks[cell]), reverse=True)
+            first = []
+        else:
+            candidates, first = self.neighbourhood_candidates(board, player)
+
+        if depth is not None and depth in self.killer_moves:
+            first += [move for move in self.killer_moves[depth] if move in candidates]
+
+        if tt_move != NO_MOVE and tt_move in candidates:
+            first.insert(0, tt_move)
+
+        if pv_move is not None and pv_move in candidates:
+            first.insert(0, pv_move)
+
+        if first:
+            ordered = []
+            for move in first:
+                if move not in ordered:
+                    ordered.append(move)
+            candidates = ordered + [move for move in candidates if move not in ordered]
+
+        return candidates
+
+    def neighbourhood_candidates(self, board: Board, player: Stone) -> tuple[list[int], list[int]]:
+        """Returns the points near the stones of one player by history and stones nearby, and the points completing or blocking five"""
         current_score = board.evaluate_board()
-    
+        manager = board.candidates_manager
+        cells_white = manager.cells_white
+        cells_black = manager.cells_black
+
         if current_score >= 1000:
-            candidates = board.candidates_manager.deep_copy(board.candidates_manager.candidates_added_white)
+            candidates = cells_white[:]
         elif current_score <= -1000:
-            candidates = board.candidates_manager.deep_copy(board.candidates_manager.candidates_added_black)
+            candidates = cells_black[:]
         elif player == Stone.WHITE:
-            if not board.candidates_manager.candidates_added_white:
-                candidates = board.candidates_manager.deep_copy(board.candidates_manager.candidates_added_black)
-            else:
-                candidates = board.candidates_manager.deep_copy(board.candidates_manager.candidates_added_white)
+            candidates = cells_white[:] if cells_white else cells_black[:]
         else:  # player == Stone.BLACK
-            if not board.candidates_manager.candidates_added_black:
-                candidates = board.candidates_manager.deep_copy(board.candidates_manager.candidates_added_white)
-            else:
-                candidates = board.candidates_manager.deep_copy(board.candidates_manager.candidates_added_black)
-    
-        if depth is not None and depth in self.killer_moves:
-            killer_moves = self.killer_moves[depth]
-             
-            for move in killer_moves:
-                if move in candidates:
-                    candidates.remove(move)
-                    candidates.insert(0, move)
-        
-        return candidates
\ No newline at end of file
+            candidates = cells_black[:] if cells_black else cells_white[:]
+
+        history = self.history[player]
+        counts_white, counts_black = manager.counts_white, manager.counts_black
+        candidates.sort(key=lambda cell: (history.get(cell, 0), counts_white[cell] + counts_black[cell]), reverse=True)
+
+        first = []
+        # Only a line scoring a four for one of the players can hold a point completing five
+        if any(self.line_holds(board, index, stone, 4, FOUR_SCORE)
+               for index in range(len(board.lines)) for stone in (Stone.WHITE, Stone.BLACK)):
+            size = board.board_size
+            blocks = [y * size + x for x, y in self.all_five_points(board, Stone(-player))]
+            wins = [y * size + x for x, y in self.all_five_points(board, player)]
+            first = wins + blocks
+            candidates += [move for move in first if move not in candidates]
+        return candidates, first
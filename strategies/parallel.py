@@ -0,0 +1,228 @@
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from utilities import Candidate
+from stones import Stone
+from board import Board
+from instrumentation import SearchStatistics
+from strategies.minimax import Minimax, SearchInterrupted, MAX_SEARCH_DEPTH
+
+# State of a worker process, kept warm between tasks
+worker_shared_bound = None
+worker_generation = None
+worker_minimax: Minimax = None
+worker_board: Board = None
+worker_position: tuple = None
+
+
+def initialize_worker(shared_bound, generation):
+    """Runs once in every worker process of the pool"""
+    global worker_shared_bound, worker_generation, worker_minimax
+    worker_shared_bound = shared_bound
+    worker_generation = generation
+    worker_minimax = Minimax()
+
+
+def get_worker_board(board_class: type, board_size: int, moves: tuple[tuple[int, int], ...]) -> Board:
+    """Returns a board of the worker at the given position, replaying the moves only when the position changed"""
+    global worker_board, worker_position
+    position = (board_class, board_size, moves)
+    if position != worker_position:
+        worker_board = board_class(board_size)
+        for x, y in moves:
+            worker_board.place(x, y)
+        worker_position = position
+    return worker_board
+
+
+def search_root_move(board_class: type, board_size: int, moves: tuple[tuple[int, int], ...],
+                     root_index: int, x: int, y: int, depth: int, deadline: float, generation: int) -> tuple[int, int, int]:
+    """Searches one root move in a worker, returns (root_index, score, nodes) with a score of None when out of time
+
+    The move is searched with a window just below the best root score found so far by any worker. Moves
+    that cannot reach that score fail low, while every move that can reach it gets an exact score, so the
+    merged result does not depend on the order in which the workers finish. The search stops at the
+    deadline, or as soon as the shared generation moves on from the one the move was handed out with.
+    """
+    if worker_generation.value != generation or (deadline is not None and time.time() >= deadline):
+        return (root_index, None, 0)
+    board = get_worker_board(board_class, board_size, moves)
+    root_player = board.current_player
+
+    bound = worker_shared_bound.value
+    alpha, beta = None, None
+    if root_player == Stone.WHITE and bound != float('-inf'):
+        alpha = bound - 1
+    if root_player == Stone.BLACK and bound != float('inf'):
+        beta = bound + 1
+
+    worker_minimax.nodes = 0
+    worker_minimax.principal_variation = []
+    worker_minimax.budget_active = True
+    worker_minimax.deadline = None if deadline is None else time.perf_counter() + (deadline - time.time())
+    worker_minimax.stop_requested = lambda: worker_generation.value != generation
+    board.place(x, y)
+    try:
+        score, _ = worker_minimax.run(depth - 1, board, alpha, beta)
+    except SearchInterrupted:
+        return (root_index, None, worker_minimax.nodes)
+    finally:
+        board.cancel()
+        worker_minimax.budget_active = False
+        worker_minimax.deadline = None
+        worker_minimax.stop_requested = None
+
+    # A move finishing after its generation was stopped must not tighten the bound of the next one
+    with worker_shared_bound.get_lock():
+        if worker_generation.value != generation:
+            return (root_index, None, worker_minimax.nodes)
+        if root_player == Stone.WHITE and score > worker_shared_bound.value:
+            worker_shared_bound.value = score
+        if root_player == Stone.BLACK and score < worker_shared_bound.value:
+            worker_shared_bound.value = score
+
+    return (root_index, score, worker_minimax.nodes)
+
+
+class ParallelMinimax:
+    """Root-parallel minimax spreading the root candidates of every depth over a pool of processes
+
+    Each worker keeps its own Minimax, with its own transposition table and killer moves, for the life of
+    the pool. The best root score is shared between workers through shared memory and tightens the window
+    of the moves searched after it. Every depth hands its moves out under a new generation, and moving the
+    generation on stops the moves still being searched.
+    """
+    def __init__(self, workers: int = None, board_class: type = Board, collect_statistics: bool = False):
+        self.workers: int = workers or os.cpu_count() or 1
+        self.board_class: type = board_class
+        self.minimax: Minimax = Minimax()
+        self.shared_bound = multiprocessing.Value('d', 0.0)
+        self.generation = multiprocessing.Value('i', 0)
+        self.executor: ProcessPoolExecutor = None
+
+        self.principal_variation: list[int] = []
+        self.completed_depth: int = 0
+        self.nodes: int = 0
+        self.root_scores: dict[int, int] = {}
+        self.collect_statistics: bool = collect_statistics
+        self.statistics: SearchStatistics = None
+
+    def get_executor(self) -> ProcessPoolExecutor:
+        """Returns the pool of workers, starting it on first use"""
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                initializer=initialize_worker,
+                                                initargs=(self.shared_bound, self.generation))
+        return self.executor
+
+    def close(self):
+        """Shuts the pool of workers down"""
+        if self.executor is not None:
+            self.next_generation()
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+    def next_generation(self) -> int:
+        """Moves the shared generation on, which stops every move of the previous one, and returns the new generation"""
+        with self.generation.get_lock():
+            self.generation.value += 1
+            return self.generation.value
+
+    def new_game(self):
+        """Forgets everything learned in the previous game, including the tables of the workers"""
+        self.minimax.new_game()
+        self.root_scores = {}
+        self.close()
+
+    def search(self, board: Board, time_limit: float = None, node_limit: int = None, max_depth: int = MAX_SEARCH_DEPTH,
+               statistics: SearchStatistics = None, resume: tuple[int, tuple[int, Candidate]] = None) -> tuple[int, Candidate]:
+        """Deepens the parallel search one ply at a time until the time runs out, returns the result of the deepest completed depth
+
+        The node limit and resume are accepted for compatibility with Minimax.search. The node limit applies
+        to the first depth only, and resume is ignored as the bot does not ponder with a pool of workers.
+        Only the nodes and time of every iteration are recorded into the statistics, the workers keep no others.
+        """
+        deadline = None if time_limit is None else time.time() + time_limit
+        self.root_scores = {}
+        self.completed_depth = 0
+        if statistics is None and self.collect_statistics:
+            statistics = SearchStatistics()
+        self.statistics = statistics
+
+        start = time.perf_counter()
+        result = self.minimax.search(board, max_depth=1, node_limit=node_limit)
+        self.principal_variation = self.minimax.principal_variation
+        self.completed_depth = 1
+        if statistics is not None:
+            statistics.end_iteration(1, self.minimax.nodes, time.perf_counter() - start)
+            statistics.nodes += self.minimax.nodes
+
+        for depth in range(2, max_depth + 1):
+            if deadline is not None and time.time() >= deadline:
+                break
+            start = time.perf_counter()
+            depth_result = self.run(depth, board, deadline)
+            if depth_result is None:
+                break
+            result = depth_result
+            self.principal_variation = [result[1].point.y * board.board_size + result[1].point.x]
+            self.completed_depth = depth
+            if statistics is not None:
+                statistics.end_iteration(depth, self.nodes, time.perf_counter() - start)
+                statistics.nodes += self.nodes
+
+        return result
+
+    def run(self, max_depth: int, board: Board, deadline: float = None) -> tuple[int, Candidate]:
+        """Searches every root candidate to max_depth in the pool, returns None if the deadline passed first"""
+        if max_depth < 2:
+            return self.minimax.run(max_depth, board)
+
+        root_player = board.current_player
+        candidates = self.minimax.get_candidate(board, root_player, depth=0)
+        if not candidates:
+            return (board.evaluate_board(), None)
+
+        # Search the moves which scored best at the previous depth first, so the shared bound tightens early
+        sign = 1 if root_player == Stone.WHITE else -1
+        order = sorted(range(len(candidates)),
+                       key=lambda i: -sign * self.root_scores.get(candidates[i], -sign * float('inf')))
+
+        moves = tuple((cell % board.board_size, cell // board.board_size) for cell in board.moves)
+        executor = self.get_executor()
+        with self.shared_bound.get_lock():
+            generation = self.next_generation()
+            self.shared_bound.value = float('-inf') if root_player == Stone.WHITE else float('inf')
+        futures = [
+            executor.submit(search_root_move, self.board_class, board.board_size, moves,
+                            i, candidates[i] % board.board_size, candidates[i] // board.board_size, max_depth, deadline,
+                            generation)
+            for i in order
+        ]
+
+        # At the deadline the moves not started are cancelled and the ones being searched are stopped, without waiting on them
+        scores = [None] * len(candidates)
+        self.nodes = 0
+        pending = set(futures)
+        while pending:
+            timeout = None if deadline is None else max(0.0, deadline - time.time())
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                for future in pending:
+                    future.cancel()
+                self.next_generation()
+                return None
+            for future in done:
+                root_index, score, nodes = future.result()
+                scores[root_index] = score
+                self.nodes += nodes
+        if any(score is None for score in scores):
+            return None
+
+        for candidate, score in zip(candidates, scores):
+            self.root_scores[candidate] = score
+
+        # Ties go to the earliest candidate in move generation order, whichever worker finished first
+        best_index = max(range(len(candidates)), key=lambda i: (sign * scores[i], -i))
+        return (scores[best_index], self.minimax.to_candidate(board, candidates[best_index], root_player))
@@ -0,0 +1,156 @@
+from functools import lru_cache
+from stones import Stone
+from board import Board
+from patterns import OFF_BOARD
+
+# What a player makes along one line by playing a point, from nothing to five in a row
+NONE = 0
+THREE = 1
+OPEN_THREE = 2
+FOUR = 3
+OPEN_FOUR = 4
+FIVE = 5
+
+# Points read on each side of a point along a line
+RADIUS = 5
+WINDOW = 2 * RADIUS + 1
+WINDOW_MASK = (1 << (2 * WINDOW)) - 1
+PADDING = sum(OFF_BOARD << (2 * i) for i in range(RADIUS))
+
+# Ranking of a point by what it makes along each of its lines
+LEVEL_SCORE = [0, 100, 1000, 2000, 50000, 1000000]
+
+# Quiet candidates kept per node, best ranked first
+MAX_CANDIDATES = 20
+
+WHITE_CODE = Stone.WHITE & 3
+BLACK_CODE = Stone.BLACK & 3
+
+# Windows whose levels are remembered, the least recently used being forgotten first
+WINDOW_CACHE_SIZE = 1 << 16
+
+
+def five_points(window: list[int], code: int, centre: int, start: int, stop: int) -> int:
+    """Counts the empty points in [start, stop) completing exactly five in a row of code through the centre"""
+    count = 0
+    for i in range(max(start, 0), min(stop, WINDOW)):
+        if window[i] != 0:
+            continue
+        left = i - 1
+        while left >= 0 and window[left] == code:
+            left -= 1
+        right = i + 1
+        while right < WINDOW and window[right] == code:
+            right += 1
+        if right - left - 1 == 5 and left < centre < right:
+            count += 1
+    return count
+
+
+def level_for(window: list[int], code: int) -> int:
+    """Returns what the player of code makes by playing the centre of a window"""
+    window = window[:]
+    window[RADIUS] = code
+    left = RADIUS - 1
+    while left >= 0 and window[left] == code:
+        left -= 1
+    right = RADIUS + 1
+    while right < WINDOW and window[right] == code:
+        right += 1
+    if right - left - 1 == 5:
+        return FIVE
+
+    fives = five_points(window, code, RADIUS, RADIUS - 4, RADIUS + 5)
+    if fives >= 2:
+        return OPEN_FOUR
+    if fives == 1:
+        return FOUR
+
+    level = NONE
+    for empty in range(RADIUS - 4, RADIUS + 5):
+        if window[empty] != 0:
+            continue
+        window[empty] = code
+        fives = five_points(window, code, RADIUS, empty - 4, empty + 5)
+        window[empty] = 0
+        if fives >= 2:
+            return OPEN_THREE
+        if fives == 1:
+            level = THREE
+    return level
+
+
+@lru_cache(maxsize=WINDOW_CACHE_SIZE)
+def levels_of_window(window_code: int) -> tuple[int, int]:
+    """Returns the levels of white and black playing the centre of an encoded window, remembering recent windows"""
+    window = [(window_code >> (2 * i)) & 3 for i in range(WINDOW)]
+    return level_for(window, WHITE_CODE), level_for(window, BLACK_CODE)
+
+
+class ThreatMap:
+    """Candidate generator reading the threats every point makes for both players from the line codes of a board
+
+    The board keeps an encoding of every line up to date as stones are placed and cancelled, so the
+    threat of a point along a line is a lookup of the window of points around it. Looking the threats up
+    for the points being ranked is cheaper than keeping them for every point after every placement,
+    since most placements are leaves which are never expanded.
+    """
+    def __init__(self, max_candidates: int = MAX_CANDIDATES):
+        self.max_candidates: int = max_candidates
+
+    def levels(self, board: Board, cell: int) -> tuple[list[int], list[int]]:
+        """Returns the levels of white and black playing a point, one per line through it"""
+        y, x = divmod(cell, board.board_size)
+        white_levels, black_levels = [], []
+        for index, position in board.lines_through[y][x]:
+            code = board.line_codes[index] | (PADDING << (2 * board.line_lengths[index]))
+            white, black = levels_of_window((((code << (2 * RADIUS)) | PADDING) >> (2 * position)) & WINDOW_MASK)
+            white_levels.append(white)
+            black_levels.append(black)
+        return white_levels, black_levels
+
+    def generate(self, board: Board, player: Stone) -> tuple[list[int], dict[int, int]]:
+        """Returns the candidates of the player to move, best ranked first, and the rank of every one
+
+        A point completing five is the only candidate. Otherwise the points blocking a five of the opponent
+        are the only candidates, then the points making an open four or two fours. When the opponent can
+        make an open four the candidates are the points where either player makes a four, which are every
+        counter attack and every block. Otherwise the best ranked points are kept.
+        """
+        manager = board.candidates_manager
+        index_white = manager.index_white
+        cells = manager.cells_white + [cell for cell in manager.cells_black if index_white[cell] < 0]
+
+        own_fives, opponent_fives, own_wins, own_fours, opponent_fours = [], [], [], [], []
+        opponent_open_four = False
+        ranks = {}
+        for cell in cells:
+            white_levels, black_levels = self.levels(board, cell)
+            own, other = (white_levels, black_levels) if player == Stone.WHITE else (black_levels, white_levels)
+            if FIVE in own:
+                own_fives.append(cell)
+            if FIVE in other:
+                opponent_fives.append(cell)
+            fours = sum(1 for level in own if level >= FOUR)
+            if OPEN_FOUR in own or fours >= 2:
+                own_wins.append(cell)
+            if fours:
+                own_fours.append(cell)
+            if any(level >= FOUR for level in other):
+                opponent_fours.append(cell)
+                opponent_open_four = opponent_open_four or OPEN_FOUR in other
+            ranks[cell] = sum(LEVEL_SCORE[level] for level in own) + sum(LEVEL_SCORE[level] for level in other)
+
+        if own_fives:
+            return own_fives[:1], ranks
+        if opponent_fives:
+            return opponent_fives, ranks
+        if own_wins:
+            return own_wins, ranks
+        if opponent_open_four:
+            forced = own_fours + [cell for cell in opponent_fours if cell not in own_fours]
+            forced.sort(key=ranks.__getitem__, reverse=True)
+            return forced, ranks
+
+        cells.sort(key=ranks.__getitem__, reverse=True)
+        return cells[:self.max_candidates], ranks
@@ -0,0 +1,213 @@
+import time
+from typing import Callable
+from utilities import Candidate
+from stones import Stone
+from board import Board
+
+WIN_SCORE = 1000000
+
+LINE_DIRECTIONS = [(1, 0), (0, 1), (1, 1), (1, -1)]
+
+# Enough points on each side of a move to see every five a three can threaten and whether that five is exact
+SEGMENT_RADIUS = 13
+
+
+class Threat:
+    """A move which threatens to win, with the points where the defender may answer it"""
+    def __init__(self, x: int, y: int, fives: list[tuple[int, int]], defences: list[tuple[int, int]]):
+        self.point: tuple[int, int] = (x, y)
+        self.fives: list[tuple[int, int]] = fives
+        self.defences: list[tuple[int, int]] = defences
+
+
+class ThreatSearch:
+    """Searches for forced wins made only of threats, victory by continuous fours (VCF) or by fours and threes (VCT)
+
+    A four threatens to complete five in a row on the next move, so the defender has to answer at the point
+    completing it. A three threatens to make a move completing five in a row at two points at once, and the
+    defender may answer it at any point involved in those fives or with a four of their own. Because every
+    answer to a threat is tried, a sequence found by the search is a forced win.
+    """
+    def __init__(self, max_depth: int = 30, max_three_depth: int = 12, max_nodes: int = 2000,
+                 time_limit: float = 0.5, use_threes: bool = True):
+        self.max_depth: int = max_depth
+        self.max_three_depth: int = max_three_depth
+        self.max_nodes: int = max_nodes
+        self.time_limit: float = time_limit
+        self.use_threes: bool = use_threes
+        self.nodes: int = 0
+        self.deadline: float = None
+        self.winning_sequence: list[Candidate] = []
+
+        # Called with the budget checks, the search gives up like when out of time once it returns true
+        self.stop_requested: Callable[[], bool] = None
+
+        # Positions where the attacker was shown not to win, with the number of plies that was searched
+        self.refuted: dict[int, int] = {}
+
+    def run(self, board: Board) -> tuple[int, Candidate]:
+        """Returns the score and first move of a forced win for the player to move, or None if no win was found"""
+        attacker = board.current_player
+        self.nodes = 0
+        self.deadline = None if self.time_limit is None else time.perf_counter() + self.time_limit
+        self.winning_sequence = []
+
+        for use_threes in ([False, True] if self.use_threes else [False]):
+            self.refuted = {}
+            max_depth = self.max_three_depth if use_threes else self.max_depth
+            sequence = self.attack(board, attacker, max_depth, use_threes)
+            if sequence is not None:
+                player = attacker
+                for x, y in sequence:
+                    self.winning_sequence.append(Candidate(x, y, player))
+                    player = Stone(-player)
+                return (WIN_SCORE * attacker, self.winning_sequence[0])
+        return None
+
+    def out_of_budget(self) -> bool:
+        """Returns whether the node or time budget of the search is spent"""
+        if self.nodes >= self.max_nodes:
+            return True
+        if self.stop_requested is not None and self.nodes & 15 == 0 and self.stop_requested():
+            return True
+        return self.deadline is not None and self.nodes & 15 == 0 and time.perf_counter() >= self.deadline
+
+    def attack(self, board: Board, attacker: Stone, remaining: int, use_threes: bool) -> list[tuple[int, int]]:
+        """Returns a winning sequence of at most remaining plies starting with a threat of the attacker, or None"""
+        if remaining <= 0 or self.out_of_budget():
+            return None
+        if self.refuted.get(board.hash_for_board, 0) >= remaining:
+            return None
+        self.nodes += 1
+
+        for x, y in self.candidate_points(board, attacker):
+            if self.completes_five(board, x, y, attacker):
+                return [(x, y)]
+
+        defender = Stone(-attacker)
+        forced = [point for point in self.candidate_points(board, defender) if self.completes_five(board, point[0], point[1], defender)]
+        if len(forced) > 1:
+            self.refuted[board.hash_for_board] = remaining
+            return None
+
+        points = forced if forced else self.candidate_points(board, attacker)
+        for x, y in points:
+            threat = self.find_threat(board, x, y, attacker, use_threes)
+            if threat is None:
+                continue
+
+            board.place(x, y)
+            sequence = self.defend(board, attacker, remaining - 1, use_threes, threat)
+            board.cancel()
+            if sequence is not None:
+                return [(x, y)] + sequence
+
+        if not self.out_of_budget():
+            self.refuted[board.hash_for_board] = remaining
+        return None
+
+    def defend(self, board: Board, attacker: Stone, remaining: int, use_threes: bool, threat: Threat) -> list[tuple[int, int]]:
+        """Tries every answer to a threat, returns the longest winning continuation if the attacker wins against all of them"""
+        defender = Stone(-attacker)
+        for x, y in self.candidate_points(board, defender):
+            if self.completes_five(board, x, y, defender):
+                return None
+
+        if threat.fives:
+            replies = threat.fives
+        else:
+            replies = list(threat.defences)
+            for x, y in self.candidate_points(board, defender):
+                if (x, y) not in replies and self.find_threat(board, x, y, defender, use_threes=False) is not None:
+                    replies.append((x, y))
+
+        longest = None
+        for x, y in replies:
+            board.place(x, y)
+            sequence = self.attack(board, attacker, remaining - 1, use_threes)
+            board.cancel()
+            if sequence is None:
+                return None
+            if longest is None or len(sequence) + 1 > len(longest):
+                longest = [(x, y)] + sequence
+        return longest
+
+    def candidate_points(self, board: Board, player: Stone) -> list[tuple[int, int]]:
+        """Returns the empty points near the stones of a player, every point where they can make a threat"""
+        if player == Stone.WHITE:
+            cells = board.candidates_manager.cells_white
+        else:
+            cells = board.candidates_manager.cells_black
+        size = board.board_size
+        return [(cell % size, cell // size) for cell in cells]
+
+    def completes_five(self, board: Board, x: int, y: int, player: Stone) -> bool:
+        """Returns whether playing at the empty point (x,y) makes exactly five in a row for the player"""
+        for dx, dy in LINE_DIRECTIONS:
+            count = 1
+            for sign in (1, -1):
+                cx, cy = x + sign * dx, y + sign * dy
+                while 0 <= cx < board.board_size and 0 <= cy < board.board_size and board.board[cy][cx] == player:
+                    count += 1
+                    cx, cy = cx + sign * dx, cy + sign * dy
+            if count == 5:
+                return True
+        return False
+
+    def read_segment(self, board: Board, x: int, y: int, dx: int, dy: int, radius: int) -> list[int]:
+        """Reads the points at offsets -radius to radius from (x,y) along a direction, points off the board read as None"""
+        size = board.board_size
+        return [board.board[y + i * dy][x + i * dx] if 0 <= x + i * dx < size and 0 <= y + i * dy < size else None
+                for i in range(-radius, radius + 1)]
+
+    def five_points(self, segment: list[int], player: Stone, start: int, stop: int) -> list[int]:
+        """Returns the indices in [start, stop) of empty points completing exactly five in a row for the player"""
+        points = []
+        for i in range(max(start, 0), min(stop, len(segment))):
+            if segment[i] != Stone.EMPTY:
+                continue
+            left = i - 1
+            while left >= 0 and segment[left] == player:
+                left -= 1
+            right = i + 1
+            while right < len(segment) and segment[right] == player:
+                right += 1
+            if right - left - 1 == 5:
+                points.append(i)
+        return points
+
+    def find_threat(self, board: Board, x: int, y: int, player: Stone, use_threes: bool) -> Threat:
+        """Returns the threat made by the player playing at (x,y), a four before a three, or None"""
+        fives = []
+        defences = []
+        for dx, dy in LINE_DIRECTIONS:
+            # Five in a row needs enough stones of the player within four points before the whole segment is worth reading
+            if self.read_segment(board, x, y, dx, dy, 4).count(player) < (2 if use_threes else 3):
+                continue
+
+            segment = self.read_segment(board, x, y, dx, dy, SEGMENT_RADIUS)
+            centre = SEGMENT_RADIUS
+
+            segment[centre] = player
+            for i in self.five_points(segment, player, centre - 4, centre + 5):
+                fives.append((x + (i - centre) * dx, y + (i - centre) * dy))
+            if fives or not use_threes:
+                continue
+
+            for e in range(centre - 4, centre + 5):
+                if segment[e] != Stone.EMPTY:
+                    continue
+                segment[e] = player
+                double = self.five_points(segment, player, e - 4, e + 5)
+                segment[e] = Stone.EMPTY
+                if len(double) >= 2:
+                    for i in [e] + double:
+                        point = (x + (i - centre) * dx, y + (i - centre) * dy)
+                        if point not in defences:
+                            defences.append(point)
+
+        if fives:
+            return Threat(x, y, fives, [])
+        if defences:
+            return Threat(x, y, [], defences)
+        return None
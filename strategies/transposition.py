@@ -0,0 +1,103 @@
+from array import array
+
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+NO_MOVE = -1
+
+
+class TranspositionTable:
+    """A fixed size table of search results keyed by Zobrist hash
+
+    The table is preallocated as parallel arrays of buckets holding two entries. The first entry of a
+    bucket is depth-preferred, it is only replaced by a result searched at least as deep or by the same
+    position, while the second entry is always replaced. Memory therefore stays the same however many
+    positions are stored.
+    """
+    def __init__(self, size: int = 1 << 18):
+        if size < 2 or size & (size - 1):
+            raise ValueError('The size of a transposition table must be a power of two')
+
+        self.size: int = size
+        self.bucket_mask: int = size // 2 - 1
+        self.keys: array = array('Q', bytes(8 * size))
+        self.depths: array = array('b', [-1]) * size
+        self.flags: array = array('b', bytes(size))
+        self.scores: array = array('q', bytes(8 * size))
+        self.moves: array = array('l', [NO_MOVE]) * size
+
+        self.used: int = 0
+        self.probes: int = 0
+        self.hits: int = 0
+        self.collisions: int = 0
+        self.stores: int = 0
+        self.overwrites: int = 0
+
+    def probe(self, key: int) -> tuple[int, int, int, int]:
+        """Returns the (depth, flag, score, move) stored for a position, or None"""
+        self.probes += 1
+        index = 2 * (key & self.bucket_mask)
+        for slot in (index, index + 1):
+            if self.keys[slot] == key and self.depths[slot] >= 0:
+                self.hits += 1
+                return (self.depths[slot], self.flags[slot], self.scores[slot], self.moves[slot])
+
+        if self.depths[index] >= 0 or self.depths[index + 1] >= 0:
+            self.collisions += 1
+        return None
+
+    def store(self, key: int, depth: int, flag: int, score: int, move: int = NO_MOVE):
+        """Stores a search result, keeping the deepest result of a bucket in its first entry"""
+        self.stores += 1
+        index = 2 * (key & self.bucket_mask)
+        if self.keys[index] == key or depth >= self.depths[index]:
+            slot = index
+        else:
+            slot = index + 1
+
+        if self.depths[slot] < 0:
+            self.used += 1
+        elif self.keys[slot] != key:
+            self.overwrites += 1
+
+        if move == NO_MOVE and self.keys[slot] == key:
+            move = self.moves[slot]
+
+        self.keys[slot] = key
+        self.depths[slot] = depth
+        self.flags[slot] = flag
+        self.scores[slot] = score
+        self.moves[slot] = move
+
+    def clear(self):
+        """Empties the table and resets its statistics"""
+        self.keys = array('Q', bytes(8 * self.size))
+        self.depths = array('b', [-1]) * self.size
+        self.flags = array('b', bytes(self.size))
+        self.scores = array('q', bytes(8 * self.size))
+        self.moves = array('l', [NO_MOVE]) * self.size
+        self.used = 0
+        self.reset_statistics()
+
+    def reset_statistics(self):
+        """Resets the counters without touching the stored entries"""
+        self.probes = 0
+        self.hits = 0
+        self.collisions = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    def statistics(self) -> dict[str, float]:
+        """Returns the hit, collision and fill statistics of the table"""
+        return {
+            'size': self.size,
+            'used': self.used,
+            'fill': self.used / self.size,
+            'probes': self.probes,
+            'hits': self.hits,
+            'hit_rate': self.hits / self.probes if self.probes else 0.0,
+            'collisions': self.collisions,
+            'stores': self.stores,
+            'overwrites': self.overwrites,
+        }
@@ -0,0 +1,18 @@
+from board import Board
+from stones import Stone
+
+
+def set_up_board(rows: list[str], board_size: int = 15, y: int = 0) -> Board:
+    """Returns a board holding rows written as W, B and _ from its top left, white stones placed first
+
+    Stones go down out of turn, and the player to move is white again afterwards.
+    """
+    board = Board(board_size)
+    for player, mark in ((Stone.WHITE, 'W'), (Stone.BLACK, 'B')):
+        for dy, row in enumerate(rows):
+            for x, stone in enumerate(row.split()):
+                if stone == mark:
+                    board.current_player = player
+                    board.place(x, y + dy)
+    board.current_player = Stone.WHITE
+    return board
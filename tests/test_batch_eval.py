@@ -0,0 +1,38 @@
+import random
+import pytest
+from board import Board
+from stones import Stone
+
+numpy = pytest.importorskip('numpy')
+from batch_eval import BatchEvaluator, stack
+
+
+def random_boards(size: int, count: int, seed: int) -> list[Board]:
+    rng = random.Random(seed)
+    boards = []
+    for _ in range(count):
+        board = Board(size)
+        for _ in range(rng.randint(0, size * 3)):
+            x, y = rng.randrange(size), rng.randrange(size)
+            if board.board[y][x] == Stone.EMPTY:
+                board.place(x, y)
+        boards.append(board)
+    return boards
+
+
+@pytest.mark.parametrize('size', [9, 15, 19])
+def test_scores_match_the_board(size):
+    boards = random_boards(size, 50, size)
+    scores = BatchEvaluator(size).evaluate(stack(boards))
+    assert scores.tolist() == [board.evaluate_board() for board in boards]
+
+
+def test_children_match_placing_each_move():
+    board = random_boards(15, 1, 4)[0]
+    cells = [cell for cell in range(15 * 15) if board.board[cell // 15][cell % 15] == Stone.EMPTY][:40]
+    expected = []
+    for cell in cells:
+        board.place(cell % 15, cell // 15)
+        expected.append(board.evaluate_board())
+        board.cancel()
+    assert BatchEvaluator(15).evaluate_children(board, cells).tolist() == expected
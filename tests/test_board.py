@@ -0,0 +1,79 @@
+import random
+from board import Board
+from stones import Stone
+from helpers import set_up_board
+
+
+def play_random_moves(board: Board, rng: random.Random, count: int):
+    empty = [cell for cell in range(board.board_size ** 2) if board.board[cell // board.board_size][cell % board.board_size] == 0]
+    rng.shuffle(empty)
+    for cell in empty[:count]:
+        board.place(cell % board.board_size, cell // board.board_size)
+
+
+def assert_matches_full_scan(board: Board):
+    incremental = (list(board.line_codes), list(board.line_scores), board.score)
+    hashes = (list(board.symmetry_hashes), board.hash_for_board)
+    board.recompute_line_scores()
+    board.initialize_hashing_for_board()
+    assert (board.line_codes, board.line_scores, board.score) == incremental
+    assert (board.symmetry_hashes, board.hash_for_board) == hashes
+
+
+def test_incremental_scores_and_hashes_match_a_full_scan():
+    rng = random.Random(3)
+    board = Board(15)
+    for _ in range(40):
+        play_random_moves(board, rng, 1)
+        assert_matches_full_scan(board)
+    while board.moves:
+        board.cancel()
+        assert_matches_full_scan(board)
+    assert board.score == 0 and board.hash_for_board == 0
+
+
+def test_line_score_for_each_player_sums_to_the_net_score():
+    board = Board(15)
+    play_random_moves(board, random.Random(5), 50)
+    for index in range(len(board.lines)):
+        white = board.line_score_for(index, Stone.WHITE)
+        black = board.line_score_for(index, Stone.BLACK)
+        assert white - black == board.line_scores[index]
+
+
+def test_stones_on_line():
+    board = set_up_board(['W B _ W W B B B'])
+    row = board.lines_through[0][0][0][0]
+    assert board.stones_on_line(row, Stone.WHITE) == 3
+    assert board.stones_on_line(row, Stone.BLACK) == 4
+
+
+def test_turned_and_mirrored_positions_share_a_canonical_hash():
+    size = 15
+    moves = [(7, 7), (8, 7), (8, 8), (6, 9), (3, 2)]
+    variants = [
+        lambda x, y: (x, y), lambda x, y: (size - 1 - y, x), lambda x, y: (size - 1 - x, size - 1 - y),
+        lambda x, y: (y, size - 1 - x), lambda x, y: (size - 1 - x, y), lambda x, y: (x, size - 1 - y),
+        lambda x, y: (y, x), lambda x, y: (size - 1 - y, size - 1 - x),
+    ]
+    keys = set()
+    for variant in variants:
+        board = Board(size)
+        for x, y in moves:
+            board.place(*variant(x, y))
+        keys.add(board.canonical_hash())
+    assert len(keys) == 1
+
+    other = Board(size)
+    for x, y in moves[:-1] + [(3, 3)]:
+        other.place(x, y)
+    assert other.canonical_hash() not in keys
+
+
+def test_copy_keeps_the_position():
+    board = Board(15)
+    play_random_moves(board, random.Random(7), 20)
+    copy = board.copy()
+    assert copy.board == board.board
+    assert copy.moves == board.moves and copy.move_players == board.move_players
+    assert copy.score == board.score and copy.symmetry_hashes == board.symmetry_hashes
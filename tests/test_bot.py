@@ -0,0 +1,13 @@
+from bot import Bot
+from bench import setup_position, CORPUS
+
+
+def test_choose_move_with_workers():
+    bot = Bot(time_limit=1.0, workers=2)
+    try:
+        board = setup_position(CORPUS['opening'])
+        _, candidate = bot.choose_move(board)
+    finally:
+        bot.minimax.close()
+    assert candidate is not None
+    assert board.board[candidate.point.y][candidate.point.x] == 0
@@ -0,0 +1,40 @@
+import random
+from board import Board
+from stones import Stone
+
+
+def candidate_state(board: Board) -> tuple:
+    manager = board.candidates_manager
+    return (list(manager.cells_white), list(manager.cells_black), list(manager.counts_white),
+            list(manager.counts_black), bytes(manager.occupied))
+
+
+def test_cancel_restores_candidates_in_order():
+    rng = random.Random(1)
+    board = Board(15)
+    states = [candidate_state(board)]
+    empty = list(range(15 * 15))
+    rng.shuffle(empty)
+    for cell in empty[:60]:
+        board.place(cell % 15, cell // 15)
+        states.append(candidate_state(board))
+    while board.moves:
+        states.pop()
+        board.cancel()
+        assert candidate_state(board) == states[-1]
+
+
+def test_candidates_are_empty_points_near_stones():
+    board = Board(15)
+    for x, y in [(7, 7), (8, 8), (0, 0), (14, 13)]:
+        board.place(x, y)
+    manager = board.candidates_manager
+    for player, cells in ((Stone.WHITE, manager.cells_white), (Stone.BLACK, manager.cells_black)):
+        expected = {
+            y * 15 + x for y in range(15) for x in range(15)
+            if board.board[y][x] == Stone.EMPTY and any(
+                board.board[y + dy * i][x + dx * i] == player
+                for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy for i in (1, 2)
+                if 0 <= x + dx * i < 15 and 0 <= y + dy * i < 15)
+        }
+        assert sorted(cells) == sorted(expected)
@@ -0,0 +1,114 @@
+from stones import Stone
+from strategies.minimax import Minimax, FOUR_SCORE
+from utilities import Frame
+from helpers import set_up_board
+
+
+def test_five_next_to_opponent_patterns_is_won():
+    board = set_up_board(['W W W W W _ B B B B _'])
+    assert max(map(abs, board.line_scores)) < board.pattern_table.pattern_score[(1, 1, 1, 1, 1)]
+    assert Minimax().is_won(board, 4)
+
+
+def test_four_is_not_won():
+    board = set_up_board(['W W W W _ _ B B B B _'])
+    assert not Minimax().is_won(board, 3)
+
+
+def four_beside_opponent_three():
+    """Returns the board after white makes B W W W W _ _ B B B, whose row scores below a four for white minus black"""
+    board = set_up_board(['B _ W W W _ _ B B B'])
+    board.place(1, 0)
+    return board
+
+
+def test_four_beside_opponent_three_has_its_five_point():
+    board = four_beside_opponent_three()
+    row = board.lines_through[0][1][0][0]
+    assert abs(board.line_scores[row]) < FOUR_SCORE
+    assert Minimax().five_points(board, Stone.WHITE, board.moves[-1]) == [(5, 0)]
+
+
+def test_four_beside_opponent_three_is_not_quiet():
+    assert not Minimax().is_quiet(four_beside_opponent_three())
+
+
+def test_four_beside_opponent_three_is_made():
+    board = four_beside_opponent_three()
+    assert Minimax().makes_four(board, board.moves[-1], Stone.WHITE)
+    assert not Minimax().makes_four(board, 7, Stone.BLACK)
+
+
+def test_futility_keeps_candidates_beside_a_four():
+    board = four_beside_opponent_three()
+    frame = Frame(1, Stone.BLACK, 0, [14 * 15 + 14, 5], None, beta=float('-inf'))
+    Minimax().skip_futile_candidates(board, frame)
+    assert frame.candidate_index == 1
+
+
+def test_neighbourhood_candidates_block_a_four_beside_opponent_three():
+    candidates, first = Minimax(threat_candidates=False).neighbourhood_candidates(four_beside_opponent_three(), Stone.BLACK)
+    assert first == [5]
+    assert 5 in candidates
+
+
+def test_principal_variation_search_keeps_the_root_score():
+    from bench import setup_position, CORPUS
+    for moves in CORPUS.values():
+        board = setup_position(moves)
+        plain = Minimax(aspiration_window=0).run(3, board)[0]
+        assert Minimax(principal_variation_search=True, aspiration_window=0).run(3, board)[0] == plain
+        assert Minimax(principal_variation_search=True).search(board, max_depth=3)[0] == plain
+
+
+def test_quiescence_completes_the_five_of_the_player_to_move():
+    board = four_beside_opponent_three()
+    board.current_player = Stone.WHITE
+    before = (list(board.moves), board.score, board.hash_for_board)
+    minimax = Minimax(quiescence=True)
+    minimax.quiescence_budget = minimax.quiescence_nodes
+    score = minimax.quiescence_search(board, Stone.WHITE, float('-inf'), float('inf'), 0)
+    assert score > board.pattern_table.pattern_score[(1, 1, 1, 1, 1)] > board.evaluate_board()
+    assert (board.moves, board.score, board.hash_for_board) == before
+
+
+def test_quiescence_blocks_the_five_of_the_opponent():
+    board = four_beside_opponent_three()
+    minimax = Minimax(quiescence=True)
+    minimax.quiescence_budget = minimax.quiescence_nodes
+    score = minimax.quiescence_search(board, Stone.BLACK, float('-inf'), float('inf'), 0)
+    board.place(5, 0)
+    # White may still stand on the static score after the block or make a four, but no longer wins
+    assert board.evaluate_board() <= score < FOUR_SCORE
+
+
+def test_transposition_table_keeps_the_root_score():
+    from bench import setup_position, CORPUS
+    from instrumentation import SearchStatistics
+    for moves in CORPUS.values():
+        board = setup_position(moves)
+        expected = Minimax(transposition_table_size=2).run(3, board)[0]
+        minimax = Minimax()
+        assert minimax.search(board, max_depth=3)[0] == expected
+        statistics = SearchStatistics()
+        assert minimax.search(board, max_depth=3, statistics=statistics)[0] == expected
+        assert statistics.tt_hits > 0
+
+
+def test_late_move_reductions_search_fewer_nodes():
+    from bench import setup_position, CORPUS
+    board = setup_position(CORPUS['opening'])
+    plain, reduced = Minimax(), Minimax(late_move_reductions=True)
+    plain_score, plain_move = plain.search(board, max_depth=4)
+    reduced_score, reduced_move = reduced.search(board, max_depth=4)
+    assert reduced.nodes < plain.nodes
+    assert reduced_score == plain_score
+    assert (reduced_move.point.x, reduced_move.point.y) == (plain_move.point.x, plain_move.point.y)
+
+
+def test_search_leaves_the_board_as_it_was():
+    from bench import setup_position, CORPUS
+    board = setup_position(CORPUS['midgame'])
+    before = (list(board.moves), board.score, list(board.symmetry_hashes), list(board.candidates_manager.cells_white))
+    Minimax(quiescence=True, late_move_reductions=True, futility_pruning=True, threat_extensions=True).search(board, max_depth=3)
+    assert (board.moves, board.score, board.symmetry_hashes, board.candidates_manager.cells_white) == before
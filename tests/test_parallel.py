@@ -0,0 +1,27 @@
+import time
+from bench import setup_position, CORPUS
+from strategies.parallel import ParallelMinimax
+
+
+def test_search_keeps_to_the_time_limit():
+    search = ParallelMinimax(2)
+    board = setup_position(CORPUS['opening'])
+    try:
+        for _ in range(3):
+            start = time.perf_counter()
+            _, candidate = search.search(board, time_limit=0.5)
+            assert time.perf_counter() - start < 0.58
+            assert candidate is not None
+    finally:
+        search.close()
+
+
+def test_search_matches_minimax_at_fixed_depth():
+    from strategies.minimax import Minimax
+    board = setup_position(CORPUS['tactical'])
+    search = ParallelMinimax(2)
+    try:
+        score, _ = search.search(board, max_depth=3)
+    finally:
+        search.close()
+    assert score == Minimax().run(3, board)[0]
@@ -0,0 +1,42 @@
+import pytest
+from strategies.transposition import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND, NO_MOVE
+
+
+def test_size_must_be_a_power_of_two():
+    with pytest.raises(ValueError):
+        TranspositionTable(6)
+
+
+def test_store_and_probe():
+    table = TranspositionTable(16)
+    assert table.probe(12345) is None
+    table.store(12345, 3, EXACT, -700, 42)
+    assert table.probe(12345) == (3, EXACT, -700, 42)
+    assert table.statistics()['hits'] == 1
+
+
+def test_first_entry_of_a_bucket_keeps_the_deepest_result():
+    table = TranspositionTable(16)
+    # Keys differing only above the bucket mask land in the same bucket
+    deep, shallow, newer = 1 | 1 << 40, 1 | 2 << 40, 1 | 3 << 40
+    table.store(deep, 5, LOWER_BOUND, 100, 1)
+    table.store(shallow, 2, UPPER_BOUND, 200, 2)
+    table.store(newer, 1, EXACT, 300, 3)
+    assert table.probe(deep) == (5, LOWER_BOUND, 100, 1)
+    assert table.probe(shallow) is None
+    assert table.probe(newer) == (1, EXACT, 300, 3)
+
+
+def test_storing_without_a_move_keeps_the_move_of_the_position():
+    table = TranspositionTable(16)
+    table.store(7, 2, EXACT, 0, 9)
+    table.store(7, 3, LOWER_BOUND, 50, NO_MOVE)
+    assert table.probe(7) == (3, LOWER_BOUND, 50, 9)
+
+
+def test_clear():
+    table = TranspositionTable(16)
+    table.store(7, 2, EXACT, 0, 9)
+    table.clear()
+    assert table.probe(7) is None
+    assert table.used == 0
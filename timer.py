@@ -1,8 +1,13 @@
-import time   
+import time
 
 class Timer:
-    def __init__(self, name: str = ""):
+    """Times a block without printing anything, adding the elapsed seconds to a phase of some statistics when given them
+
+    Meant for coarse boundaries such as a whole search or one of its phases, not for the inner loop of a search.
+    """
+    def __init__(self, name: str = "", statistics=None):
         self.name = name
+        self.statistics = statistics
         self.start_time = None
         self.end_time = None
 
@@ -12,15 +17,12 @@ class Timer:
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.end_time = time.perf_counter()
-        elapsed = self.end_time - self.start_time
-        if self.name:
-            print(f"[{self.name}] Elapsed time: {elapsed:.6f} seconds")
-        else:
-            print(f"Elapsed time: {elapsed:.6f} seconds")
+        if self.statistics is not None:
+            self.statistics.add_phase_time(self.name, self.end_time - self.start_time)
 
     @property
     def elapsed(self):
         if self.start_time is None:
             return 0
         end = self.end_time or time.perf_counter()
-        return end - self.start_time
\ No newline at end of file
+        return end - self.start_time
@@ -8,12 +8,8 @@ from board import Board
 from stones import Stone
 from board import Move
 from timer import Timer
-import cProfile
 from bot import Bot
 import threading
-import time
-import pstats
-import io
 
 
 def distance(point_one: tuple[float, float], point_two: tuple[float, float]):
@@ -126,13 +122,16 @@ class UI:
             return
         
         self.board.place(closest_neighbor.x, closest_neighbor.y)
-        self.draw_stones(self.canvas, self.board.move_stack[-1])
-        if self.board.check_win(closest_neighbor.x, closest_neighbor.y, self.board.move_stack[-1].player):
-            winner = "Black" if self.board.move_stack[-1].player == Stone.BLACK else "White"
+        last_move = self.board.last_move()
+        self.draw_stones(self.canvas, last_move)
+        if self.board.check_win(closest_neighbor.x, closest_neighbor.y, last_move.player):
+            winner = "Black" if last_move.player == Stone.BLACK else "White"
             answer = messagebox.askyesno("Game Over", f"{winner} Won！\nDo you want to play again?")
             self.canvas.unbind("<Button-1>")
             if answer:
                 self.board.reset()
+                if self.bot != None:
+                    self.bot.new_game()
                 self.canvas.delete("all")
                 self.draw_board(self.canvas)
                 self.canvas.bind("<Button-1>", self.on_click)
@@ -147,13 +146,19 @@ class UI:
         
     def redraw_board(self, canvas: tk.Canvas) -> None:
         canvas.delete("stones")
-        for move in self.board.move_stack:
-            self.draw_stones(canvas, move)
+        # Read the stones straight from the undo logs of the board rather than building a Move for each
+        size = self.board.board_size
+        for cell, player in zip(self.board.moves, self.board.move_players):
+            y, x = divmod(cell, size)
+            self.draw_stone(canvas, x, y, player)
 
     def draw_stones(self, canvas: tk.Canvas, move: Move) -> None:
-        x = (move.point.x + 1) * self.cell_size
-        y = (move.point.y + 1) * self.cell_size
-        if move.player == Stone.WHITE:
+        self.draw_stone(canvas, move.point.x, move.point.y, move.player)
+
+    def draw_stone(self, canvas: tk.Canvas, point_x: int, point_y: int, player: Stone) -> None:
+        x = (point_x + 1) * self.cell_size
+        y = (point_y + 1) * self.cell_size
+        if player == Stone.WHITE:
             color = 'white'
         else:
             color = 'black'
@@ -184,9 +189,7 @@ class UI:
         self.coord_text_id = None
         self.font_size = math.ceil(self.stone_radius*0.7)
         self.draw_board(self.canvas)
-        print(self.board.move_stack)
-        for move in self.board.move_stack:
-            self.draw_stones(self.canvas, move)
+        self.redraw_board(self.canvas)
     
     def draw_candidates(self, canvas:tk.Canvas):
         for candidate in self.board.candidates_manager.candidates_added_white:
@@ -196,31 +199,20 @@ class UI:
             self.draw_candidate_stone(canvas, candidate)
     
     def trigger_ai_turn(self):
-        start = time.time()
-        pr = cProfile.Profile()
-        pr.enable()
-
-        
-        for i in range(1, 3):
-            (score, ai_move) = self.bot.minimax.run(max_depth=i, board=self.board)
-
-
-        pr.disable()
-        s = io.StringIO()
-        ps = pstats.Stats(pr, stream=s).sort_stats("cumulative")
-        ps.print_stats(20)  # 显示前 20 个函数
-        print(s.getvalue())
+        (score, ai_move) = self.bot.choose_move(self.board)
 
         def place_ai_move():
             self.board.place(ai_move.point.x, ai_move.point.y)
-            self.draw_stones(self.canvas, self.board.move_stack[-1])
+            last_move = self.board.last_move()
+            self.draw_stones(self.canvas, last_move)
 
-            if self.board.check_win(ai_move.point.x, ai_move.point.y, self.board.move_stack[-1].player):
-                winner = "Black" if self.board.move_stack[-1].player == Stone.BLACK else "White"
+            if self.board.check_win(ai_move.point.x, ai_move.point.y, last_move.player):
+                winner = "Black" if last_move.player == Stone.BLACK else "White"
                 answer = messagebox.askyesno("Game Over", f"{winner} Won!\nDo you want to play again?")
                 self.canvas.unbind("<Button-1>")
                 if answer:
                     self.board.reset()
+                    self.bot.new_game()
                     self.canvas.delete("all")
                     self.draw_board(self.canvas)
                     self.canvas.bind("<Button-1>", self.on_click)
@@ -228,16 +220,20 @@ class UI:
                     self.root.destroy()
             else:
                 self.canvas.bind("<Button-1>", self.on_click)
+                self.bot.start_pondering(self.board)
         self.root.after(0, place_ai_move)
 
     def on_key_m(self, event):
-        with Timer('Minimax'):
+        self.bot.stop_pondering()
+        with Timer('Minimax') as timer:
             print(self.bot.minimax.run(max_depth=3, board=self.board))
+        print(f"[Minimax] Elapsed time: {timer.elapsed:.6f} seconds")
 
     def on_key_l(self, event):
-        with Timer('Cancel'):
+        with Timer('Cancel') as timer:
             self.board.cancel()
             self.redraw_board(self.canvas)
+        print(f"[Cancel] Elapsed time: {timer.elapsed:.6f} seconds")
 
     def on_key_p(self, event):
         self.draw_candidates(self.canvas)
@@ -1,7 +1,8 @@
-import numpy
 from stones import Stone
 
 class Candidate:
+    __slots__ = ('point', 'player')
+
     def __init__(self, x: int, y: int, stone: Stone):
         self.point: Point =  Point(x, y)
         self.player: Stone = stone
@@ -10,12 +11,18 @@ class Candidate:
         return f'({self.point.x}, {self.point.y})'
 
 class Frame:
+    """A node of the minimax search, its candidates and moves are points encoded as y * board_size + x"""
+    __slots__ = ('depth', 'player', 'candidate_index', 'candidates', 'best_score', 'current_candidate',
+                 'best_candidate', 'alpha', 'beta', 'alpha_original', 'beta_original', 'key',
+                 'on_principal_variation', 'principal_variation', 'horizon', 'reduction')
+
     def __init__(self,
                  depth: int,
                  player: Stone,
                  candidate_index: int,
-                 candidates: list[Candidate],
-                 current_candidate: Candidate, alpha: int = None, beta: int = None):
+                 candidates: list[int],
+                 current_candidate: int, alpha: int = None, beta: int = None, key: int = 0,
+                 on_principal_variation: bool = False, horizon: int = None, reduction: int = 0):
         self.depth = depth
         self.player = player
         self.candidate_index = candidate_index
@@ -25,15 +32,23 @@ class Frame:
         self.best_candidate = None
         self.alpha = alpha if alpha is not None else float('-inf')
         self.beta = beta if beta is not None else float('inf')
+        self.alpha_original = self.alpha
+        self.beta_original = self.beta
+        self.key = key
+        self.on_principal_variation = on_principal_variation
+        self.principal_variation: list[int] = []
+
+        # Depth at which the candidates of this line are scored as leaves, and the plies it was reduced by
+        self.horizon = horizon
+        self.reduction = reduction
 
 class Move:
     "A class simulating a move on a Gomoku board"
-    def __init__(self, x: int, y: int, stone: Stone, candidates_added: int):
+    __slots__ = ('point', 'player')
+
+    def __init__(self, x: int, y: int, stone: Stone):
         self.point: Point =  Point(x, y)
         self.player: Stone = stone
-        self.candidates_added: int = candidates_added
-        self.took_candidate_place_white: bool = False
-        self.took_candidate_place_black: bool = False
     def __eq__(self, other):
         if not isinstance(other, Move):
             return False
@@ -45,79 +60,163 @@ class Move:
     
 class Point:
     "A class simulating a point on a Gomoku board"
+    __slots__ = ('x', 'y')
+
     def __init__(self, x: int, y: int):
         self.x: int = x
         self.y: int = y
 
+# The directions in which a stone makes the points at distance 1 and 2 candidates
+NEIGHBOUR_DIRECTIONS: list[tuple[int, int]] = [
+    (-1, 0), #left
+    (1, 0),  #right
+    (0, 1), #down
+    (0, -1), #up
+    (-1, -1),#left up
+    (1, -1), #right up
+    (-1, 1),
+    (1, 1) #right down
+]
+
 class CandidateManager:
-    """Class that manages the possible points which the minimax should consider"""
+    """Class that manages the possible points which the minimax should consider
+
+    A point is a candidate of a player when it is empty and at least one stone of that player lies within
+    distance 2 of it in one of the eight directions. Every point keeps a count of those stones for each
+    player, and every candidate list keeps the position of each of its points, so points enter and leave a
+    list in constant time. Stones have to be removed in the reverse order they were placed in, which
+    restores both candidate lists exactly, order included.
+
+    The lists hold points encoded as y * board_size + x. Candidate objects are created once per point and
+    player, and are only handed out to callers outside the search.
+    """
     def __init__(self, board_size: int):
         self.board_size = board_size
-        self.candidate_points_white = numpy.zeros((board_size, board_size), dtype=bool)
-        self.candidate_points_black = numpy.zeros((board_size, board_size), dtype=bool)
-        self.candidates_added_white = []
-        self.candidates_added_black = []
-    
-    def deep_copy(self, candidates: list[Candidate]) -> list[Candidate]:
-        """Returns a deepcopy of a candidate list"""
-        return [Candidate(c.point.x, c.point.y, c.player) for c in candidates]
+        num_of_points = board_size * board_size
+        self.neighbours: list[list[int]] = self.generate_neighbours()
+        self.occupied: bytearray = bytearray(num_of_points)
 
-    def add_candidate_for_player(self, point: Point, player: Stone) -> bool:
-        """Add a point to the candidate list of a player"""
-        if player == Stone.WHITE:
-            self.candidate_points_white[point.y][point.x] = True
-            self.candidates_added_white.append(Candidate(point.x, point.y, Stone.WHITE))
-            return True
-        if player == Stone.BLACK:
-            self.candidate_points_black[point.y][point.x] = True
-            self.candidates_added_black.append(Candidate(point.x, point.y, Stone.BLACK))
-            return True
-        return False
+        self.counts_white: list[int] = [0] * num_of_points
+        self.counts_black: list[int] = [0] * num_of_points
+        self.cells_white: list[int] = []
+        self.cells_black: list[int] = []
+        self.index_white: list[int] = [-1] * num_of_points
+        self.index_black: list[int] = [-1] * num_of_points
 
-    def is_a_candidate(self, point: Point, player: Stone) -> bool:
-        """Removes the candidate at some point from one player"""
-        if player != Stone.WHITE and player != Stone.BLACK:
-            raise Exception('Player error, check if player is handled correctly')
-        
+        self.candidate_of_white: list[Candidate] = [Candidate(cell % board_size, cell // board_size, Stone.WHITE) for cell in range(num_of_points)]
+        self.candidate_of_black: list[Candidate] = [Candidate(cell % board_size, cell // board_size, Stone.BLACK) for cell in range(num_of_points)]
+
+        # For every stone placed, the positions its point had in the white and black candidate lists
+        self.undo_log: list[int] = []
+
+    def generate_neighbours(self) -> list[list[int]]:
+        """Lists for every point the points at distance 1 and then 2 from it, as y * board_size + x"""
+        neighbours = []
+        for y in range(self.board_size):
+            for x in range(self.board_size):
+                cells = []
+                for i in range(1, 3):
+                    for dx, dy in NEIGHBOUR_DIRECTIONS:
+                        if 0 <= x + dx * i < self.board_size and 0 <= y + dy * i < self.board_size:
+                            cells.append((y + dy * i) * self.board_size + x + dx * i)
+                neighbours.append(cells)
+        return neighbours
+
+    @property
+    def candidates_added_white(self) -> list[Candidate]:
+        """The candidates of white, in the order of the point list"""
+        return [self.candidate_of_white[cell] for cell in self.cells_white]
+
+    @property
+    def candidates_added_black(self) -> list[Candidate]:
+        """The candidates of black, in the order of the point list"""
+        return [self.candidate_of_black[cell] for cell in self.cells_black]
+
+    def get_lists(self, player: Stone) -> tuple[list[int], list[int]]:
+        """Returns the point list and index map of a player"""
         if player == Stone.WHITE:
-            if self.candidate_points_white[point.y][point.x] != Stone.EMPTY:
-                return True
-            return False
+            return self.cells_white, self.index_white
         if player == Stone.BLACK:
-            if self.candidate_points_black[point.y][point.x] != Stone.EMPTY:
-                return True
+            return self.cells_black, self.index_black
+        raise Exception('Player error, check if player is handled correctly')
+
+    def append_cell(self, cell: int, player: Stone):
+        """Appends a point to the end of the candidate list of a player"""
+        cells, index = self.get_lists(player)
+        index[cell] = len(cells)
+        cells.append(cell)
+
+    def discard_cell(self, cell: int, player: Stone) -> int:
+        """Removes a point from the candidate list of a player by moving the last candidate into its place, returns its former position or -1"""
+        cells, index = self.get_lists(player)
+        position = index[cell]
+        if position < 0:
+            return -1
+
+        last_cell = cells.pop()
+        if last_cell != cell:
+            cells[position] = last_cell
+            index[last_cell] = position
+        index[cell] = -1
+        return position
+
+    def restore_cell(self, cell: int, player: Stone, position: int):
+        """Undoes discard_cell, putting a point back at its former position"""
+        if position < 0:
+            return
+
+        cells, index = self.get_lists(player)
+        if position == len(cells):
+            self.append_cell(cell, player)
+            return
+
+        moved_cell = cells[position]
+        index[moved_cell] = len(cells)
+        cells.append(moved_cell)
+        cells[position] = cell
+        index[cell] = position
+
+    def add_candidate_for_player(self, point: Point, player: Stone) -> bool:
+        """Add a point to the candidate list of a player"""
+        cell = point.y * self.board_size + point.x
+        if self.is_a_candidate(point, player):
             return False
+        self.append_cell(cell, player)
+        return True
+
+    def is_a_candidate(self, point: Point, player: Stone) -> bool:
+        """Returns whether a point is a candidate of a player"""
+        _, index = self.get_lists(player)
+        return index[point.y * self.board_size + point.x] >= 0
 
     def remove_candidate_from_player(self, point: Point, player: Stone) -> bool:
         """Removes the candidate at some point from one player"""
-        if player == Stone.WHITE:
-            self.candidate_points_white[point.y][point.x] = False
-            for i, candidate in enumerate(self.candidates_added_white):
-                if candidate.point.x == point.x and candidate.point.y == point.y:
-                    del self.candidates_added_white[i]
-                    return True
-            return False
-        if player == Stone.BLACK:
-            self.candidate_points_black[point.y][point.x] = False
-            for i, candidate in enumerate(self.candidates_added_black):
-                if candidate.point.x == point.x and candidate.point.y == point.y:
-                    del self.candidates_added_black[i]
-                    return True
-            return False
+        return self.discard_cell(point.y * self.board_size + point.x, player) >= 0
 
-    def clear_all_candidates_at_point(self, point: Point) -> bool:
-        """Clears candidates existing in both lists at some point"""
-        if self.candidate_points_white[point.y][point.x]:
-            self.candidate_points_white[point.y][point.x] = False
-        if self.candidate_points_black[point.y][point.x]:
-            self.candidate_points_black[point.y][point.x] = False
-        self.candidates_added_white = [
-            c for c in self.candidates_added_white
-            if not (c.point.x == point.x and c.point.y == point.y)
-        ]
-        self.candidates_added_black = [
-            c for c in self.candidates_added_black
-            if not (c.point.x == point.x and c.point.y == point.y)
-        ]
-        return True
+    def place_stone(self, x: int, y: int, player: Stone):
+        """Updates the candidates after a stone of the player is placed at (x,y)"""
+        cell = y * self.board_size + x
+        self.undo_log.append(self.discard_cell(cell, Stone.WHITE))
+        self.undo_log.append(self.discard_cell(cell, Stone.BLACK))
+        self.occupied[cell] = 1
+
+        counts = self.counts_white if player == Stone.WHITE else self.counts_black
+        occupied = self.occupied
+        for neighbour in self.neighbours[cell]:
+            counts[neighbour] += 1
+            if counts[neighbour] == 1 and not occupied[neighbour]:
+                self.append_cell(neighbour, player)
+
+    def remove_stone(self, x: int, y: int, player: Stone):
+        """Undoes place_stone for the last stone placed, which was a stone of the player at (x,y)"""
+        cell = y * self.board_size + x
+        counts = self.counts_white if player == Stone.WHITE else self.counts_black
+        occupied = self.occupied
+        for neighbour in reversed(self.neighbours[cell]):
+            counts[neighbour] -= 1
+            if counts[neighbour] == 0 and not occupied[neighbour]:
+                self.discard_cell(neighbour, player)
 
+        self.occupied[cell] = 0
+        self.restore_cell(cell, Stone.BLACK, self.undo_log.pop())
+        self.restore_cell(cell, Stone.WHITE, self.undo_log.pop())
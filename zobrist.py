@@ -0,0 +1,88 @@
+import random
+from array import array
+from stones import Stone
+
+# Every process draws the same keys from this seed, so hashes can be compared across games and processes
+ZOBRIST_SEED = 0x5A0B_2157
+
+# The eight ways of turning and mirroring a square board, as functions of (x, y) and the largest coordinate
+SYMMETRIES = (
+    lambda x, y, m: (x, y),
+    lambda x, y, m: (m - y, x),
+    lambda x, y, m: (m - x, m - y),
+    lambda x, y, m: (y, m - x),
+    lambda x, y, m: (m - x, y),
+    lambda x, y, m: (x, m - y),
+    lambda x, y, m: (y, x),
+    lambda x, y, m: (m - y, m - x),
+)
+
+
+class ZobristTable:
+    """Seeded Zobrist keys for one board size, shared by every board of that size
+
+    The keys are a flat array of unsigned 64 bit integers, one for each point and colour, at index
+    2 * (y * board_size + x) for white and the next one for black. The hash of a position is the XOR of
+    the keys of its stones, so the empty board hashes to 0. For every point the table also lists where
+    it lands under each of the eight symmetries of the board, and the keys it toggles there, so a board
+    can keep the hash of all eight transformed positions up to date with eight XORs per move.
+    """
+    def __init__(self, board_size: int, seed: int = ZOBRIST_SEED):
+        self.board_size: int = board_size
+        self.seed: int = seed
+        generator = random.Random(seed * 1000003 + board_size)
+        self.keys: array = array('Q', (generator.getrandbits(64) for _ in range(2 * board_size * board_size)))
+
+        largest = board_size - 1
+        self.symmetric_cells: list[tuple[int, ...]] = []
+        for cell in range(board_size * board_size):
+            y, x = divmod(cell, board_size)
+            self.symmetric_cells.append(tuple(ty * board_size + tx for tx, ty in
+                                              (symmetry(x, y, largest) for symmetry in SYMMETRIES)))
+
+        # Where every point of a transformed position came from, the inverse of symmetric_cells
+        self.inverse_cells: list[list[int]] = [[0] * (board_size * board_size) for _ in SYMMETRIES]
+        for cell, images in enumerate(self.symmetric_cells):
+            for index, image in enumerate(images):
+                self.inverse_cells[index][image] = cell
+
+        # The keys a stone toggles in the eight hashes, at the same index as its own key
+        self.symmetric_keys: list[tuple[int, ...]] = []
+        for index in range(len(self.keys)):
+            cell, offset = divmod(index, 2)
+            self.symmetric_keys.append(tuple(self.keys[2 * symmetric + offset] for symmetric in self.symmetric_cells[cell]))
+
+    def key(self, cell: int, stone: Stone) -> int:
+        """Returns the key of a stone of a colour at a point"""
+        return self.keys[2 * cell + (stone == Stone.BLACK)]
+
+    def transform(self, cell: int, symmetry: int) -> int:
+        """Returns where a point lands under a symmetry"""
+        return self.symmetric_cells[cell][symmetry]
+
+    def untransform(self, cell: int, symmetry: int) -> int:
+        """Returns the point which lands on a point under a symmetry"""
+        return self.inverse_cells[symmetry][cell]
+
+    def hashes(self, board: list[list[int]]) -> list[int]:
+        """Computes the hashes of a position under the eight symmetries from scratch"""
+        hashes = [0] * len(SYMMETRIES)
+        for y, row in enumerate(board):
+            for x, stone in enumerate(row):
+                if stone != Stone.EMPTY:
+                    keys = self.symmetric_keys[2 * (y * self.board_size + x) + (stone == Stone.BLACK)]
+                    hashes = [value ^ key for value, key in zip(hashes, keys)]
+        return hashes
+
+
+# Tables already made, one per board size and seed
+tables: dict[tuple[int, int], ZobristTable] = {}
+
+
+def zobrist_table(board_size: int, seed: int = ZOBRIST_SEED) -> ZobristTable:
+    """Returns the Zobrist table of a board size, making it the first time it is asked for"""
+    table = tables.get((board_size, seed))
+    if table is None:
+        table = ZobristTable(board_size, seed)
+        tables[(board_size, seed)] = table
+    return table